@@ -13,7 +13,8 @@ import sys
 import base64
 from pathlib import Path
 from datetime import datetime
-from typing import Dict, List, Optional
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Callable, Dict, List, Optional
 
 # 添加 scripts 到路径
 sys.path.insert(0, str(Path(__file__).parent / "scripts"))
@@ -27,6 +28,7 @@ import fitz  # PyMuPDF
 
 from scripts.arxiv_fetcher import ArXivFetcher
 from scripts.doclayout_extractor import DocLayoutExtractor as FigureExtractor
+from scripts.llm_cache import LLMResponseCache, CACHE_MODES
 from scripts.utils import setup_logging, format_authors
 
 
@@ -41,21 +43,49 @@ class PaperStorytellerSkill:
     4. 生成带图片的精美 HTML 网页
     """
 
-    def __init__(self, gemini_api_key: str, output_dir: str = "output"):
+    TEXT_MODEL_NAME = 'gemini-2.0-flash-exp'
+
+    # 内联到 HTML 时按扩展名确定 data URI 的 MIME 类型
+    IMAGE_MIME_TYPES = {
+        '.png': 'image/png',
+        '.jpg': 'image/jpeg',
+        '.jpeg': 'image/jpeg',
+        '.webp': 'image/webp',
+        '.svg': 'image/svg+xml',
+    }
+
+    # 矢量结构图（SVG）送入多模态模型前的栅格化分辨率
+    SVG_RASTER_DPI = 200
+
+    def __init__(self, gemini_api_key: str, output_dir: str = "output",
+                 max_concurrency: int = 4, cache_mode: str = "use",
+                 cache_path: Optional[str] = None):
         """
         初始化
 
         Args:
             gemini_api_key: Gemini API 密钥
             output_dir: 输出目录
+            max_concurrency: 内容生成的最大并发请求数（1 为串行）
+            cache_mode: LLM 响应缓存模式："use" 命中即复用，"refresh" 忽略旧结果并重新写入，"off" 不使用缓存
+            cache_path: 缓存数据库路径（默认 cache/llm_responses.sqlite）
         """
+        if cache_mode not in CACHE_MODES:
+            raise ValueError(f"cache_mode 必须是 {CACHE_MODES} 之一: {cache_mode}")
         self.gemini_api_key = gemini_api_key
         self.output_dir = Path(output_dir)
+        self.max_concurrency = max(1, max_concurrency)
         self.output_dir.mkdir(parents=True, exist_ok=True)
 
         # 初始化 Gemini (文本生成)
         genai.configure(api_key=gemini_api_key)
-        self.model = genai.GenerativeModel('gemini-2.0-flash-exp')
+        self.model = genai.GenerativeModel(self.TEXT_MODEL_NAME)
+
+        # LLM 响应缓存（相同模型 + prompt + 图片时复用结果）
+        self.cache_mode = cache_mode
+        self.llm_cache = None
+        if cache_mode != "off":
+            self.llm_cache = LLMResponseCache(**({"cache_path": cache_path} if cache_path else {}))
         
         # 初始化 Imagen (图片生成)
         self.imagen_client = genai_client.Client(api_key=gemini_api_key)
@@ -164,7 +194,12 @@ class PaperStorytellerSkill:
 
         # 2. 提取 Pipeline 结构图
         logger.info(f"\n🎨 步骤 2/6: 使用 PaddleOCR 提取结构图")
-        figures_result = self.figure_extractor.extract_from_pdf(pdf_path, max_pages=10)
+        # 只使用主图（及次选），其余候选不写盘；优先用 PDF 原生信息定位，必要时才运行检测模型，
+        # 检测只针对带架构类图注的页，按页面先验顺序扫描并在主图已确定时提前结束
+        figures_result = self.figure_extractor.extract_from_pdf(
+            pdf_path, max_pages=10, persist_top_k=2, native_first=True, early_exit=True,
+            caption_first=True,
+        )
         logger.success(f"   ✅ 提取了 {figures_result['total_figures']} 个图片")
 
         # 2.5. 提取 Method 章节文本
@@ -624,38 +659,99 @@ Requirements:
 Output directly (numbered):"""
 
         # ===== 执行 API 调用 =====
-        viral_title = self._clean_response(self.model.generate_content(viral_title_prompt).text)
-        hook_intro = self._clean_response(self.model.generate_content(hook_intro_prompt).text)
-        problem = self._clean_response(self.model.generate_content(problem_prompt).text)
-        solution = self._clean_response(self.model.generate_content(solution_prompt).text)
-        
+        # 各段内容互不依赖，提交到线程池并发生成；单段失败不影响其他段
+        section_prompts = {
+            'viral_title': viral_title_prompt,
+            'hook_intro': hook_intro_prompt,
+            'problem_statement': problem_prompt,
+            'solution_overview': solution_prompt,
+            'key_innovations': innovations_prompt,
+            'applications': applications_prompt,
+            'ten_questions': ten_questions_prompt,
+            'reviewer_perspective': reviewer_prompt,
+            'improvements': improvement_prompt,
+        }
+        tasks = {
+            key: (lambda prompt=prompt: self._clean_response(self._generate_text(prompt)))
+            for key, prompt in section_prompts.items()
+        }
         # ===== 架构描述：使用多模态 API（Method 文本 + Pipeline 图片）=====
-        architecture = self._generate_architecture_description(
+        tasks['architecture_description'] = lambda: self._generate_architecture_description(
             title=title,
             abstract=abstract,
             method_text=method_text,
             pipeline_figure=pipeline_figure,
             language=language
         )
-        
-        innovations = self._clean_response(self.model.generate_content(innovations_prompt).text)
-        applications = self._clean_response(self.model.generate_content(applications_prompt).text)
-        ten_questions = self._clean_response(self.model.generate_content(ten_questions_prompt).text)
-        reviewer_perspective = self._clean_response(self.model.generate_content(reviewer_prompt).text)
-        improvements = self._clean_response(self.model.generate_content(improvement_prompt).text)
+
+        results = self._run_concurrently(tasks)
 
         return {
-            'viral_title': viral_title,
-            'hook_intro': hook_intro,
-            'problem_statement': problem,
-            'solution_overview': solution,
-            'architecture_description': architecture,
-            'key_innovations': innovations,
-            'applications': applications,
-            'ten_questions': ten_questions,
-            'reviewer_perspective': reviewer_perspective,
-            'improvements': improvements
+            'viral_title': results['viral_title'],
+            'hook_intro': results['hook_intro'],
+            'problem_statement': results['problem_statement'],
+            'solution_overview': results['solution_overview'],
+            'architecture_description': results['architecture_description'],
+            'key_innovations': results['key_innovations'],
+            'applications': results['applications'],
+            'ten_questions': results['ten_questions'],
+            'reviewer_perspective': results['reviewer_perspective'],
+            'improvements': results['improvements']
         }
+
+    def _generate_text(self, contents) -> str:
+        """
+        调用 Gemini 文本生成（带持久化缓存）
+
+        Args:
+            contents: prompt 字符串，或 prompt 与 PIL 图片混合的列表
+
+        Returns:
+            模型返回的原始文本
+        """
+        if self.llm_cache is None:
+            return self.model.generate_content(contents).text
+
+        key = LLMResponseCache.make_key(self.TEXT_MODEL_NAME, contents)
+        if self.cache_mode == "use":
+            cached = self.llm_cache.get(key)
+            if cached is not None:
+                logger.debug(f"      LLM 缓存命中: {key[:12]}")
+                return cached
+
+        text = self.model.generate_content(contents).text
+        self.llm_cache.put(key, self.TEXT_MODEL_NAME, text)
+        return text
+
+    def _run_concurrently(self, tasks: Dict[str, Callable[[], str]]) -> Dict[str, str]:
+        """
+        并发执行互不依赖的生成任务
+
+        Args:
+            tasks: {内容键: 无参生成函数}
+
+        Returns:
+            {内容键: 生成结果}，失败的任务返回空字符串
+        """
+        results = {}
+
+        def run(key: str, task: Callable[[], str]) -> None:
+            try:
+                results[key] = task()
+            except Exception as e:
+                logger.warning(f"   生成 {key} 失败: {e}")
+                results[key] = ""
+
+        if self.max_concurrency <= 1:
+            for key, task in tasks.items():
+                run(key, task)
+            return results
+
+        with ThreadPoolExecutor(max_workers=self.max_concurrency) as pool:
+            futures = [pool.submit(run, key, task) for key, task in tasks.items()]
+            for future in as_completed(futures):
+                future.result()
+        return results
     
     def _generate_architecture_description(self, title: str, abstract: str, 
                                            method_text: Optional[str],
@@ -669,8 +765,6 @@ Output directly (numbered):"""
         2. 结合 Pipeline 结构图进行理解
         3. 专业视角讲解 + 统一的通俗比喻贯穿全文
         """
-        import PIL.Image
-        
         # 构建输入内容列表（多模态）
         content_parts = []
         
@@ -779,7 +873,7 @@ Output directly:"""
         # 添加 Pipeline 图片（如果有）
         if pipeline_figure and pipeline_figure.exists():
             try:
-                img = PIL.Image.open(pipeline_figure)
+                img = self._load_figure_image(pipeline_figure)
                 content_parts.append(img)
                 logger.info(f"      添加 Pipeline 图片: {pipeline_figure.name}")
             except Exception as e:
@@ -794,12 +888,11 @@ Output directly:"""
         
         # 调用 API
         try:
-            response = self.model.generate_content(content_parts)
-            return self._clean_response(response.text)
+            return self._clean_response(self._generate_text(content_parts))
         except Exception as e:
             logger.warning(f"架构描述生成失败: {e}")
             # 降级：使用纯文本生成
-            return self._clean_response(self.model.generate_content(arch_prompt).text)
+            return self._clean_response(self._generate_text(arch_prompt))
     
     def _clean_response(self, text: str) -> str:
         """
@@ -943,7 +1036,7 @@ Visual style:
 直接输出你设计的场景描述："""
         
         try:
-            scene = self._clean_response(self.model.generate_content(scene_prompt).text)[:150]
+            scene = self._clean_response(self._generate_text(scene_prompt))[:150]
             logger.info(f"      场景: {scene[:60]}...")
         except:
             scene = "A person connecting images and words with glowing threads of light"
@@ -990,7 +1083,7 @@ Art direction:
 直接输出场景描述："""
         
         try:
-            problem_scene = self._clean_response(self.model.generate_content(problem_scene_prompt).text)[:150]
+            problem_scene = self._clean_response(self._generate_text(problem_scene_prompt))[:150]
             logger.info(f"      问题场景: {problem_scene[:50]}...")
         except:
             problem_scene = "A robot confused by an unfamiliar object it cannot classify"
@@ -1065,11 +1158,22 @@ Art direction:
             logger.warning(f"   Imagen fallback 也失败 ({filename}): {e}")
             return None
 
+    def _load_figure_image(self, image_path: Path):
+        """以 PIL 图片加载结构图；SVG 先用 PyMuPDF 按 SVG_RASTER_DPI 栅格化（多模态模型不接受 SVG）"""
+        import PIL.Image
+
+        if Path(image_path).suffix.lower() != '.svg':
+            return PIL.Image.open(image_path)
+        with fitz.open(str(image_path)) as doc:
+            pix = doc[0].get_pixmap(dpi=self.SVG_RASTER_DPI, alpha=False)
+            return PIL.Image.frombytes('RGB', (pix.width, pix.height), pix.samples)
+
     def _image_to_base64(self, image_path: Path) -> str:
-        """将图片转换为 base64 编码"""
+        """将图片转换为 base64 data URI（MIME 类型按扩展名确定）"""
+        mime_type = self.IMAGE_MIME_TYPES.get(Path(image_path).suffix.lower(), 'image/png')
         with open(image_path, 'rb') as f:
             encoded = base64.b64encode(f.read()).decode('utf-8')
-        return f"data:image/png;base64,{encoded}"
+        return f"data:{mime_type};base64,{encoded}"
 
     def _generate_html(self,
                        metadata: Dict,
@@ -2158,6 +2262,14 @@ def main():
     parser.add_argument('--lang', default='zh', choices=['zh', 'en'], help='Language (zh or en)')
     parser.add_argument('--api-key', help='Gemini API key (or set GOOGLE_API_KEY env var)')
     parser.add_argument('--output', default='output', help='Output directory')
+    parser.add_argument('--concurrency', type=int, default=4,
+                        help='Max concurrent Gemini requests for content generation (1 = serial)')
+    cache_group = parser.add_mutually_exclusive_group()
+    cache_group.add_argument('--no-cache', dest='cache_mode', action='store_const', const='off',
+                             help='Bypass the LLM response cache')
+    cache_group.add_argument('--refresh-cache', dest='cache_mode', action='store_const', const='refresh',
+                             help='Ignore cached LLM responses and overwrite them with fresh ones')
+    parser.set_defaults(cache_mode='use')
 
     args = parser.parse_args()
 
@@ -2171,7 +2283,12 @@ def main():
         sys.exit(1)
 
     # Process paper
-    skill = PaperStorytellerSkill(gemini_api_key=api_key, output_dir=args.output)
+    skill = PaperStorytellerSkill(
+        gemini_api_key=api_key,
+        output_dir=args.output,
+        max_concurrency=args.concurrency,
+        cache_mode=args.cache_mode,
+    )
     html_path = skill.process_paper(args.arxiv_url, language=args.lang)
 
     print(f"\n✅ 完成！网页已生成: {html_path}")
@@ -0,0 +1,1041 @@
+"""
+DocLayout Extractor 基准测试
+
+用法（在仓库根目录执行）：
+    python -m scripts.benchmark_doclayout two-dpi test_paper/*.pdf --detect-dpi 100
+    python -m scripts.benchmark_doclayout batch test_paper/ --batch-sizes 1 2 4 8
+    python -m scripts.benchmark_doclayout backends test_paper/ --fp32 --int8 --opencv
+    python -m scripts.benchmark_doclayout threads test_paper/ --configs 1:on 2:on 4:on 4:off
+    python -m scripts.benchmark_doclayout render test_paper/
+    python -m scripts.benchmark_doclayout preprocess test_paper/
+    python -m scripts.benchmark_doclayout captions test_paper/
+    python -m scripts.benchmark_doclayout encoding test_paper/ --formats png:1 png:9 webp:85 jpeg:90
+    python -m scripts.benchmark_doclayout memory --budget-mb 256
+    python -m scripts.benchmark_doclayout render-workers --workers 1 2 --latency-ms 50
+    python -m scripts.benchmark_doclayout offline --latency-ms 50 --json-out bench.json --baseline old.json
+
+每个子命令在同一组 PDF 上对比不同的提取路径，输出耗时、内存峰值以及主图是否一致。
+内存峰值通过 tracemalloc 统计（覆盖 numpy 分配的页面缓冲区，不含 Paddle/MuPDF 内部内存）。
+offline 子命令不需要模型与真实论文：合成 PDF + 确定性的假检测后端，输出分阶段耗时并写 JSON 便于跨提交对比。
+"""
+
+import argparse
+import json
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Callable, Dict, List, Tuple
+
+import cv2
+import fitz  # PyMuPDF
+import numpy as np
+from loguru import logger
+
+from . import doclayout_extractor
+from .doclayout_extractor import (
+    PIPELINE_STAGES,
+    DocLayoutExtractor,
+    LayoutBackend,
+    OnnxLayoutBackend,
+    OpenCVLayoutBackend,
+    PageBufferRing,
+    PaddleLayoutBackend,
+    _render_page_bgr,
+    default_cpu_threads,
+    layout_from_boxes,
+    reset_peak_rss,
+    resize_to_model_input,
+)
+
+
+def _collect_pdfs(inputs: List[str]) -> List[Path]:
+    """展开目录 / 文件参数为 PDF 列表"""
+    pdfs = []
+    for item in inputs:
+        path = Path(item)
+        if path.is_dir():
+            pdfs.extend(sorted(path.glob("*.pdf")))
+        elif path.suffix.lower() == ".pdf":
+            pdfs.append(path)
+    return pdfs
+
+
+def _measure(fn: Callable[[], Dict]) -> Tuple[Dict, float, float]:
+    """执行 fn，返回 (结果, 耗时秒, tracemalloc 峰值 MB)"""
+    tracemalloc.start()
+    start = time.perf_counter()
+    try:
+        result = fn()
+    finally:
+        elapsed = time.perf_counter() - start
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    return result, elapsed, peak / 1024 / 1024
+
+
+def _main_key(result: Dict):
+    """用 (页码, 取整后的 PDF 坐标) 标识主图，便于比较两条路径是否选中同一区域"""
+    figures = result.get("figures") or []
+    if not figures:
+        return None
+    best = figures[0]
+    return best["page"], tuple(round(v) for v in best["rect"])
+
+
+def bench_two_dpi(args) -> None:
+    """单分辨率（整页 dpi 渲染）vs 双分辨率（低 DPI 检测 + 区域高 DPI 裁剪）"""
+    extractor = DocLayoutExtractor(
+        output_dir=tempfile.mkdtemp(prefix="bench_two_dpi_"),
+        model_dir=args.model_dir,
+        device=args.device,
+    )
+    _ = extractor.engine  # 预热：模型加载不计入耗时
+
+    modes = {
+        "single": dict(dpi=args.dpi),
+        "two-dpi": dict(dpi=args.dpi, detect_dpi=args.detect_dpi),
+    }
+    totals = {name: [0.0, 0.0] for name in modes}
+    agree = 0
+
+    pdfs = _collect_pdfs(args.pdfs)
+    for pdf in pdfs:
+        keys = {}
+        for name, kwargs in modes.items():
+            result, elapsed, peak = _measure(
+                lambda: extractor.extract_from_pdf(str(pdf), max_pages=args.max_pages, **kwargs)
+            )
+            totals[name][0] += elapsed
+            totals[name][1] = max(totals[name][1], peak)
+            keys[name] = _main_key(result)
+            print(f"{pdf.name:40s} {name:8s} {elapsed:7.2f}s  peak {peak:7.1f} MB  main={keys[name]}")
+        agree += keys["single"] == keys["two-dpi"]
+
+    print("\n汇总")
+    for name, (elapsed, peak) in totals.items():
+        print(f"  {name:8s} 总耗时 {elapsed:7.2f}s  最大峰值 {peak:7.1f} MB")
+    print(f"  主图一致: {agree}/{len(pdfs)}")
+    shutil.rmtree(extractor.output_dir, ignore_errors=True)
+
+
+def bench_batch(args) -> None:
+    """不同 batch_size 下的检测吞吐（页/秒）"""
+    extractor = DocLayoutExtractor(
+        output_dir=tempfile.mkdtemp(prefix="bench_batch_"),
+        model_dir=args.model_dir,
+        device=args.device,
+    )
+    _ = extractor.engine  # 预热：模型加载不计入耗时
+
+    pdfs = _collect_pdfs(args.pdfs)
+    total_pages = 0
+    for pdf in pdfs:
+        with fitz.open(str(pdf)) as doc:
+            total_pages += min(len(doc), args.max_pages)
+
+    print(f"{len(pdfs)} 个 PDF, 共 {total_pages} 页")
+    baseline = {}
+    for batch_size in args.batch_sizes:
+        start = time.perf_counter()
+        for pdf in pdfs:
+            result = extractor.extract_from_pdf(
+                str(pdf), max_pages=args.max_pages, dpi=args.dpi, batch_size=batch_size
+            )
+            key = _main_key(result)
+            baseline.setdefault(pdf, key)
+            if baseline[pdf] != key:
+                print(f"  ⚠️ {pdf.name}: batch_size={batch_size} 主图与 batch_size={args.batch_sizes[0]} 不一致")
+        elapsed = time.perf_counter() - start
+        print(f"  batch_size={batch_size:<3d} {elapsed:7.2f}s  {total_pages / elapsed:6.2f} 页/秒")
+    shutil.rmtree(extractor.output_dir, ignore_errors=True)
+
+
+def _iou(a: List[float], b: List[float]) -> float:
+    ix = max(0.0, min(a[2], b[2]) - max(a[0], b[0]))
+    iy = max(0.0, min(a[3], b[3]) - max(a[1], b[1]))
+    inter = ix * iy
+    union = (a[2] - a[0]) * (a[3] - a[1]) + (b[2] - b[0]) * (b[3] - b[1]) - inter
+    return inter / union if union > 0 else 0.0
+
+
+def _render_pages(pdfs: List[Path], max_pages: int, dpi: int):
+    """渲染所有 PDF 的前 max_pages 页（一次性渲染，避免计入后端耗时）"""
+    extractor = DocLayoutExtractor(output_dir=tempfile.mkdtemp(prefix="bench_render_"))
+    pages = []
+    for pdf in pdfs:
+        with fitz.open(str(pdf)) as doc:
+            for page_idx, image in extractor.iter_page_images(doc, range(min(len(doc), max_pages)), dpi=dpi):
+                pages.append((f"{pdf.name}#p{page_idx + 1}", image))
+    shutil.rmtree(extractor.output_dir, ignore_errors=True)
+    return pages
+
+
+def bench_backends(args) -> None:
+    """Paddle vs ONNX Runtime fp32 / int8、OpenCV 轻量检测（均按参数启用）：逐页延迟与 image 框一致性"""
+    model_dir = Path(args.model_dir or "model")
+    backends = {"paddle": PaddleLayoutBackend(model_dir, args.device)}
+    if args.fp32 or args.onnx:
+        backends["onnx"] = OnnxLayoutBackend(model_dir, onnx_path=args.onnx)
+    if args.int8:
+        backends["onnx-int8"] = OnnxLayoutBackend(model_dir, onnx_path=args.onnx, quantize=True)
+    if args.opencv:
+        backends["opencv"] = OpenCVLayoutBackend()
+
+    pages = _render_pages(_collect_pdfs(args.pdfs), args.max_pages, args.dpi)
+    print(f"{len(pages)} 页 @ {args.dpi} DPI")
+
+    outputs = {}
+    for name, backend in backends.items():
+        backend.detect([pages[0][1]])  # 预热
+        latencies = []
+        outputs[name] = []
+        for _, image in pages:
+            start = time.perf_counter()
+            outputs[name].append(backend.detect([image])[0])
+            latencies.append(time.perf_counter() - start)
+        latencies.sort()
+        print(
+            f"  {name:10s} 平均 {sum(latencies) / len(latencies) * 1000:7.1f} ms/页  "
+            f"p50 {latencies[len(latencies) // 2] * 1000:7.1f} ms  p95 {latencies[int(len(latencies) * 0.95)] * 1000:7.1f} ms"
+        )
+
+    # 一致性：以 Paddle 的 image 框为参照，按 IoU 匹配
+    reference = outputs["paddle"]
+    for name, layouts in outputs.items():
+        if name == "paddle":
+            continue
+        matched = total = extra = 0
+        for ref, other in zip(reference, layouts):
+            ref_boxes = [b["bbox"] for b in ref["images"]]
+            other_boxes = [b["bbox"] for b in other["images"]]
+            total += len(ref_boxes)
+            extra += max(0, len(other_boxes) - len(ref_boxes))
+            for box in ref_boxes:
+                if any(_iou(box, o) >= args.iou for o in other_boxes):
+                    matched += 1
+        recall = matched / total if total else 1.0
+        print(f"  {name:10s} 与 paddle 一致: {matched}/{total} 个 image 框 IoU≥{args.iou} ({recall:.1%})，多检 {extra} 个")
+
+
+def _parse_thread_config(text: str) -> Dict:
+    """解析 THREADS[:on|off[:CACHE]] 形式的配置，如 4、4:on、4:off、4:on:20"""
+    parts = text.split(":")
+    options = {"cpu_threads": int(parts[0])}
+    if len(parts) > 1:
+        options["enable_mkldnn"] = parts[1].lower() in ("on", "1", "true")
+    if len(parts) > 2:
+        options["mkldnn_cache_capacity"] = int(parts[2])
+    return options
+
+
+def bench_threads(args) -> None:
+    """不同 CPU 线程数 / MKLDNN 配置下的 Paddle 检测吞吐（页/秒）"""
+    model_dir = Path(args.model_dir or "model")
+    pages = _render_pages(_collect_pdfs(args.pdfs), args.max_pages, args.dpi)
+    configs = args.configs or [
+        f"{n}:on" for n in sorted({1, 2, 4, default_cpu_threads(1)}) if n <= default_cpu_threads(1)
+    ] + [f"{default_cpu_threads(1)}:off"]
+    print(f"{len(pages)} 页 @ {args.dpi} DPI，可用 CPU {default_cpu_threads(1)} 个")
+
+    for config in configs:
+        options = _parse_thread_config(config)
+        backend = PaddleLayoutBackend(model_dir, "cpu", options)
+        backend.detect([pages[0][1]])  # 预热（含 MKLDNN 形状缓存）
+        start = time.perf_counter()
+        for _, image in pages:
+            backend.detect([image])
+        elapsed = time.perf_counter() - start
+        print(f"  {config:12s} {len(pages) / elapsed:6.2f} 页/秒  ({elapsed:.2f}s)")
+        # 每个配置单独加载引擎，测完释放，避免多份模型同时驻留
+        doclayout_extractor._engine_registry.clear()
+
+
+def _render_page_legacy(page: "fitz.Page", dpi: int) -> np.ndarray:
+    """旧渲染路径：pix.samples 复制出 bytes，cvtColor 再分配一张整页 BGR 图"""
+    mat = fitz.Matrix(dpi / 72, dpi / 72)
+    pix = page.get_pixmap(matrix=mat)
+    img = np.frombuffer(pix.samples, dtype=np.uint8).reshape(pix.height, pix.width, pix.n)
+    if pix.n == 4:
+        return cv2.cvtColor(img, cv2.COLOR_RGBA2BGR)
+    return cv2.cvtColor(img, cv2.COLOR_RGB2BGR)
+
+
+def bench_render(args) -> None:
+    """
+    旧渲染路径 vs 零拷贝 + 缓冲区复用路径：每页耗时与 tracemalloc 峰值，并核对
+
+    - 两条路径像素完全一致
+    - 复用路径各页写入同一块缓冲区（除页面尺寸变大外不再分配）
+
+    任一核对失败时以非零状态码退出
+    """
+    failures = []
+    totals = {"legacy": [0.0, 0.0], "reuse": [0.0, 0.0]}
+    page_count = 0
+
+    for pdf in _collect_pdfs(args.pdfs):
+        with fitz.open(str(pdf)) as doc:
+            indices = range(min(len(doc), args.max_pages))
+            page_count += len(indices)
+            ring = PageBufferRing(1)
+            paths = {
+                "legacy": lambda i: _render_page_legacy(doc[i], args.dpi),
+                "reuse": lambda i: _render_page_bgr(doc[i], dpi=args.dpi, buffers=ring),
+            }
+
+            # 计时：逐页渲染后立即丢弃，与检测流程的驻留方式一致
+            for name, render in paths.items():
+                _, elapsed, peak = _measure(lambda: [render(i).shape for i in indices])
+                totals[name][0] += elapsed
+                totals[name][1] = max(totals[name][1], peak)
+
+            # 核对
+            shapes = set()
+            for i in indices:
+                expected = paths["legacy"](i)
+                image = paths["reuse"](i)
+                shapes.add(image.shape)
+                if not np.array_equal(expected, image):
+                    failures.append(f"{pdf.name}#p{i + 1}: 像素与旧路径不一致")
+                if image.base is None:
+                    failures.append(f"{pdf.name}#p{i + 1}: 输出未写入复用缓冲区")
+            if ring.allocations > len(shapes):
+                failures.append(f"{pdf.name}: {len(indices)} 页分配了 {ring.allocations} 次缓冲区")
+
+    print(f"{page_count} 页 @ {args.dpi} DPI")
+    for name, (elapsed, peak) in totals.items():
+        per_page = elapsed / page_count * 1000 if page_count else 0.0
+        print(f"  {name:7s} {per_page:7.1f} ms/页  最大峰值 {peak:7.1f} MB")
+    for failure in failures:
+        print(f"  ❌ {failure}")
+    if failures:
+        sys.exit(1)
+    print("  ✅ 像素一致，页面缓冲区已复用")
+
+
+def bench_preprocess(args) -> None:
+    """
+    检测前缩放到模型输入尺寸 vs 整页送入引擎
+
+    - 预处理：引擎内部在整页上做双三次缩放 vs 先 INTER_LINEAR 缩到输入尺寸（引擎内部缩放变为同尺寸）
+    - 端到端检测耗时，以及两种方式 image 框的一致性（坐标均在整页像素下比较）
+    """
+    output_dir = tempfile.mkdtemp(prefix="bench_preprocess_")
+    extractors = {
+        name: DocLayoutExtractor(
+            output_dir=output_dir, model_dir=args.model_dir, device=args.device, resize_input=resize
+        )
+        for name, resize in (("full-page", False), ("resized", True))
+    }
+    input_size = extractors["resized"].detect_input_size
+    if input_size is None:
+        print("无法从 inference.yml 读取模型输入尺寸")
+        sys.exit(1)
+    target_h, target_w = input_size
+
+    pages = _render_pages(_collect_pdfs(args.pdfs), args.max_pages, args.dpi)
+    print(f"{len(pages)} 页 @ {args.dpi} DPI，模型输入 {target_w}x{target_h}")
+
+    # 预处理阶段：复现引擎内部的 Resize（双三次）
+    prep = {"full-page": 0.0, "resized": 0.0}
+    for _, image in pages:
+        start = time.perf_counter()
+        cv2.resize(image, (target_w, target_h), interpolation=cv2.INTER_CUBIC)
+        prep["full-page"] += time.perf_counter() - start
+        start = time.perf_counter()
+        small, _ = resize_to_model_input(image, input_size)
+        cv2.resize(small, (target_w, target_h), interpolation=cv2.INTER_CUBIC)
+        prep["resized"] += time.perf_counter() - start
+
+    outputs = {}
+    for name, extractor in extractors.items():
+        extractor._detect_layout(pages[0][1])  # 预热
+        start = time.perf_counter()
+        outputs[name] = [extractor._detect_layout(image) for _, image in pages]
+        elapsed = time.perf_counter() - start
+        print(
+            f"  {name:10s} 预处理 {prep[name] / len(pages) * 1000:6.1f} ms/页  "
+            f"检测 {elapsed / len(pages) * 1000:7.1f} ms/页"
+        )
+
+    matched = total = 0
+    for ref, other in zip(outputs["full-page"], outputs["resized"]):
+        other_boxes = [b["bbox"] for b in other["images"]]
+        for box in ref["images"]:
+            total += 1
+            matched += any(_iou(box["bbox"], o) >= args.iou for o in other_boxes)
+    print(f"  image 框一致: {matched}/{total} 个 IoU≥{args.iou}")
+    shutil.rmtree(output_dir, ignore_errors=True)
+
+
+def bench_captions(args) -> None:
+    """
+    图注优先定位 vs 逐页检测：召回率与实际检测的页数
+
+    以逐页检测（不加分）选出的主图为参照，caption_first 的候选中有同页且 IoU≥阈值的框即算召回；
+    同时统计 caption_first 的主图是否落在参照主图上
+    """
+    extractor = DocLayoutExtractor(
+        output_dir=tempfile.mkdtemp(prefix="bench_captions_"),
+        model_dir=args.model_dir,
+        device=args.device,
+    )
+
+    pdfs = _collect_pdfs(args.pdfs)
+    totals = {"baseline": [0, 0.0], "caption": [0, 0.0]}
+    recalled = same_main = with_reference = 0
+
+    for pdf in pdfs:
+        runs = {}
+        for name, kwargs in (("baseline", {}), ("caption", {"caption_first": True})):
+            start = time.perf_counter()
+            runs[name] = extractor.extract_from_pdf(
+                str(pdf), max_pages=args.max_pages, persist_top_k=0, **kwargs
+            )
+            totals[name][0] += runs[name]["stats"]["pages_scanned"]
+            totals[name][1] += time.perf_counter() - start
+
+        reference = runs["baseline"]["figures"][0] if runs["baseline"]["figures"] else None
+        candidates = runs["caption"]["figures"]
+        hit = main_hit = False
+        if reference is not None:
+            with_reference += 1
+            hit = any(
+                f["page"] == reference["page"] and _iou(f["rect"], reference["rect"]) >= args.iou
+                for f in candidates
+            )
+            main_hit = bool(candidates) and candidates[0]["page"] == reference["page"] and (
+                _iou(candidates[0]["rect"], reference["rect"]) >= args.iou
+            )
+            recalled += hit
+            same_main += main_hit
+        stats = runs["caption"]["stats"]
+        print(
+            f"{pdf.name:40s} 检测页 {runs['baseline']['stats']['pages_scanned']:2d} -> {stats['pages_scanned']:2d}  "
+            f"图注页 {stats['caption_pages']:2d}  召回 {'✓' if hit else '✗'}  主图一致 {'✓' if main_hit else '✗'}"
+        )
+
+    print("\n汇总")
+    for name, (pages, elapsed) in totals.items():
+        print(f"  {name:8s} 检测 {pages:4d} 页  {elapsed:7.2f}s")
+    if with_reference:
+        print(f"  召回: {recalled}/{with_reference} ({recalled / with_reference:.1%})  主图一致: {same_main}/{with_reference}")
+    shutil.rmtree(extractor.output_dir, ignore_errors=True)
+
+
+def _collect_crops(extractor: DocLayoutExtractor, pdfs: List[Path], max_pages: int, dpi: int):
+    """用提取流程定位候选，再按 dpi 渲染出真实的裁剪图"""
+    crops = []
+    for pdf in pdfs:
+        result = extractor.extract_from_pdf(str(pdf), max_pages=max_pages, dpi=dpi, persist_top_k=0)
+        with fitz.open(str(pdf)) as doc:
+            for figure in result["figures"]:
+                crops.append(extractor._render_region(doc[figure["page"] - 1], fitz.Rect(figure["rect"]), dpi=dpi))
+    return crops
+
+
+def bench_encoding(args) -> None:
+    """
+    不同输出格式 / 质量参数下的编码耗时与文件大小（含 base64 内联到 HTML 后的大小），
+    以及同步写盘 vs 后台编码线程的端到端耗时
+    """
+    output_dir = tempfile.mkdtemp(prefix="bench_encoding_")
+    pdfs = _collect_pdfs(args.pdfs)
+    base = DocLayoutExtractor(output_dir=output_dir, model_dir=args.model_dir, device=args.device)
+    crops = _collect_crops(base, pdfs, args.max_pages, args.dpi)
+    if not crops:
+        print("未找到任何候选图片")
+        sys.exit(1)
+    megapixels = sum(c.shape[0] * c.shape[1] for c in crops) / 1e6
+    print(f"{len(crops)} 张裁剪图 @ {args.dpi} DPI，共 {megapixels:.1f} MP")
+
+    for spec in args.formats:
+        fmt, _, quality = spec.partition(":")
+        extractor = DocLayoutExtractor(
+            output_dir=output_dir, image_format=fmt, image_quality=int(quality) if quality else None
+        )
+        size = 0
+        start = time.perf_counter()
+        for crop in crops:
+            _, encoded = cv2.imencode(extractor.image_ext, crop, extractor._encode_params)
+            size += encoded.nbytes
+        elapsed = time.perf_counter() - start
+        base64_size = (size + 2) // 3 * 4
+        print(
+            f"  {extractor.image_format}:{extractor.image_quality:<4d} "
+            f"{elapsed / len(crops) * 1000:7.1f} ms/张  {size / 1024:9.1f} KB  base64 {base64_size / 1024:9.1f} KB"
+        )
+
+    print("\n端到端（每个候选都写盘）")
+    for workers in (0, args.encode_workers):
+        extractor = DocLayoutExtractor(
+            output_dir=output_dir, model_dir=args.model_dir, device=args.device, encode_workers=workers
+        )
+        start = time.perf_counter()
+        for pdf in pdfs:
+            extractor.extract_from_pdf(str(pdf), max_pages=args.max_pages, dpi=args.dpi)
+        elapsed = time.perf_counter() - start
+        label = "同步写盘" if workers == 0 else f"后台 {workers} 线程"
+        print(f"  {label:10s} {elapsed:7.2f}s")
+    shutil.rmtree(output_dir, ignore_errors=True)
+
+
+# 合成大页面 PDF 的页面尺寸（pt）：A0 海报、A3 横向、常规 Letter
+POSTER_PAGE_SIZES = [(2384, 3370), (1191, 842), (612, 792)]
+
+
+def _make_large_page_pdf(path: Path, pages: int) -> None:
+    """生成含大幅矢量图、图注与正文的合成大页面 PDF，循环使用 POSTER_PAGE_SIZES"""
+    doc = fitz.open()
+    for i in range(pages):
+        width, height = POSTER_PAGE_SIZES[i % len(POSTER_PAGE_SIZES)]
+        page = doc.new_page(width=width, height=height)
+        margin = width * 0.1
+        figure = fitz.Rect(margin, height * 0.15, width - margin, height * 0.55)
+        for j in range(12):
+            cell = fitz.Rect(
+                figure.x0 + j % 4 * figure.width / 4, figure.y0 + j // 4 * figure.height / 3,
+                figure.x0 + (j % 4 + 1) * figure.width / 4, figure.y0 + (j // 4 + 1) * figure.height / 3,
+            )
+            page.draw_rect(cell, color=(0, 0, 0.6), fill=(0.8, 0.9, 1), width=2)
+        page.insert_text(
+            (margin, figure.y1 + 24), f"Figure {i + 1}: Overview of the proposed framework.",
+            fontsize=max(10, width / 120),
+        )
+        for k in range(20):
+            page.insert_text((margin, height * 0.62 + k * 18), "Lorem ipsum dolor sit amet " * 4, fontsize=10)
+    doc.save(str(path))
+    doc.close()
+
+
+def check_memory_budget(
+    workdir: Path,
+    budget_mb: float,
+    pages: int = 6,
+    dpi: int = 300,
+    batch_size: int = 4,
+    render_workers: int = 0,
+) -> Tuple[Dict[str, Dict], List[str]]:
+    """
+    内存预算模式回归检查：在合成大页面 PDF 上对比无预算与 budget_mb 预算下的常驻内存增量（VmHWM - 起始 RSS）
+
+    使用 FakeLayoutBackend，不需要模型与 paddleocr。核对项：
+    - 预算模式的内存增量不得超过预算
+    - 预算模式选出的主图（页码、区域）与无预算时一致，评分相差不超过 1（裁剪尺寸的取整误差）
+
+    返回: ({模式名: 运行结果}, 失败说明列表)
+    """
+    pdf = workdir / "poster.pdf"
+    _make_large_page_pdf(pdf, pages)
+
+    modes = {"unbounded": None, f"budget {budget_mb:g}MB": budget_mb}
+    results = {}
+    for name, budget in modes.items():
+        extractor = DocLayoutExtractor(
+            output_dir=str(workdir / "out"), backend=FakeLayoutBackend(), memory_budget_mb=budget,
+        )
+        reset_peak_rss()
+        start = time.perf_counter()
+        result = extractor.extract_from_pdf(
+            str(pdf), max_pages=pages, dpi=dpi, batch_size=batch_size, render_workers=render_workers,
+        )
+        stats = result["stats"]
+        best = result["figures"][0] if result["figures"] else None
+        results[name] = {
+            "elapsed_s": time.perf_counter() - start,
+            "growth_mb": stats["peak_rss_mb"] - stats["rss_start_mb"],
+            "largest_page_bytes": max((m["bytes"] for m in stats["page_memory"]), default=0),
+            "dpis": sorted({m["dpi"] for m in stats["page_memory"]}),
+            "main": (best["page"], [round(v) for v in best["rect"]], round(float(best["total_score"]), 1)) if best else None,
+        }
+
+    failures = []
+    base, bounded = results.values()
+    if bounded["growth_mb"] > budget_mb:
+        failures.append(f"预算模式 RSS 增量 {bounded['growth_mb']:.1f} MB 超出预算 {budget_mb:g} MB")
+    if (base["main"] is None) != (bounded["main"] is None) or (
+        base["main"] and (base["main"][:2] != bounded["main"][:2] or abs(base["main"][2] - bounded["main"][2]) > 1)
+    ):
+        failures.append(f"主图不一致（页码, 区域, 评分）: {base['main']} vs {bounded['main']}")
+    return results, failures
+
+
+def bench_memory(args) -> None:
+    """内存预算模式回归检查（check_memory_budget），任一核对失败时以非零状态码退出"""
+    if not reset_peak_rss():
+        print("⚠️ 当前平台无法重置 VmHWM，峰值为进程生命周期内的最大值")
+    workdir = Path(tempfile.mkdtemp(prefix="bench_memory_"))
+    try:
+        results, failures = check_memory_budget(
+            workdir, args.budget_mb, pages=args.pages, dpi=args.dpi,
+            batch_size=args.batch_size, render_workers=args.render_workers,
+        )
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    for name, run in results.items():
+        print(
+            f"  {name:16s} {run['elapsed_s']:7.2f}s  RSS 增量 {run['growth_mb']:7.1f} MB  "
+            f"最大页面缓冲 {run['largest_page_bytes'] / 1024 / 1024:6.1f} MB  渲染 DPI {run['dpis']}  主图 {run['main']}"
+        )
+    for failure in failures:
+        print(f"  ❌ {failure}")
+    if failures:
+        sys.exit(1)
+    print("  ✅ 峰值内存在预算内，主图一致")
+
+
+def bench_render_workers(args) -> None:
+    """
+    顺序渲染 vs 渲染进程池（render_workers）：合成 PDF + FakeLayoutBackend 的端到端页/秒
+
+    同一提取器连续处理多个 PDF（进程池与共享内存槽跨 PDF 复用），预热一轮后取墙钟耗时居中的一轮。
+    并行模式比顺序慢或主图不一致时以非零状态码退出；可用 CPU 不足 2 个时并行模式退回顺序渲染，只报告不判定
+    """
+    workdir = Path(tempfile.mkdtemp(prefix="bench_render_workers_"))
+    pdfs = _collect_pdfs(args.pdfs)
+    if not pdfs:
+        for i in range(args.docs):
+            pdf = workdir / f"synthetic_{i}.pdf"
+            make_synthetic_pdf(pdf, args.pages, seed=i)
+            pdfs.append(pdf)
+
+    results = {}
+    try:
+        for workers in [0] + args.workers:
+            with DocLayoutExtractor(
+                output_dir=str(workdir / f"out_{workers}"),
+                backend=FakeLayoutBackend(latency_ms=args.latency_ms),
+            ) as extractor:
+                effective = extractor._effective_render_workers(workers)
+                kwargs = dict(
+                    max_pages=args.pages, dpi=args.dpi, batch_size=args.batch_size,
+                    render_workers=workers, persist_top_k=1,
+                )
+                extractor.extract_from_pdf(str(pdfs[0]), **kwargs)  # 预热：进程池启动不计入
+                walls = []
+                for _ in range(args.repeat):
+                    pages = 0
+                    mains = []
+                    start = time.perf_counter()
+                    for pdf in pdfs:
+                        result = extractor.extract_from_pdf(str(pdf), **kwargs)
+                        pages += result["stats"]["pages_scanned"]
+                        mains.append(_main_key(result))
+                    walls.append(time.perf_counter() - start)
+            wall = sorted(walls)[len(walls) // 2]
+            results[workers] = {"effective": effective, "wall_s": wall, "pages": pages, "mains": mains}
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    serial = results[0]
+    failures = []
+    print(f"{len(pdfs)} 个 PDF，{serial['pages']} 页 @ {args.dpi} DPI，检测延迟 {args.latency_ms} ms/页，"
+          f"可用 CPU {default_cpu_threads(1)}")
+    for workers, run in results.items():
+        speedup = serial["wall_s"] / run["wall_s"] if run["wall_s"] else 0.0
+        print(f"  render_workers={workers} (实际 {run['effective']})  {run['wall_s']:7.2f}s  "
+              f"{run['pages'] / run['wall_s']:7.2f} 页/秒  加速 {speedup:5.2f}x")
+        if run["mains"] != serial["mains"]:
+            failures.append(f"render_workers={workers}: 主图与顺序渲染不一致")
+        if run["effective"] and run["wall_s"] > serial["wall_s"]:
+            failures.append(f"render_workers={workers}: 比顺序渲染慢")
+    for failure in failures:
+        print(f"  ❌ {failure}")
+    if failures:
+        sys.exit(1)
+    if not any(run["effective"] for run in results.values()):
+        print("  ⚠️ 可用 CPU 不足 2 个，并行渲染已退回顺序渲染，未做对比")
+    else:
+        print("  ✅ 并行渲染快于顺序渲染，主图一致")
+
+
+class FakeLayoutBackend(LayoutBackend):
+    """
+    确定性的假检测后端：把页面上的彩色区域（通道差异大的像素连通块）当作图片
+
+    合成 PDF 中的位图与矢量图都带彩色填充、正文为黑色，结果可复现且不需要模型文件；
+    每页 sleep latency_ms 模拟推理耗时
+    """
+
+    name = "fake"
+
+    def __init__(self, latency_ms: float = 0.0, max_side: int = 512, min_area: float = 0.01):
+        """
+        Args:
+            latency_ms: 每页模拟的推理延迟
+            max_side: 检测前把页面最长边缩放到的像素数
+            min_area: 候选框占页面面积的最小比例
+        """
+        self.latency_ms = latency_ms
+        self.max_side = max_side
+        self.min_area = min_area
+
+    def _detect_one(self, image: np.ndarray) -> Dict:
+        h, w = image.shape[:2]
+        scale = min(1.0, self.max_side / max(h, w))
+        small = cv2.resize(
+            image, (max(1, round(w * scale)), max(1, round(h * scale))), interpolation=cv2.INTER_NEAREST
+        )
+        spread = small.max(axis=2).astype(np.int16) - small.min(axis=2)
+        mask = cv2.morphologyEx((spread > 40).astype(np.uint8), cv2.MORPH_CLOSE, np.ones((5, 5), np.uint8))
+        _, _, components, _ = cv2.connectedComponentsWithStats(mask, connectivity=8)
+        boxes = []
+        for x, y, bw, bh, area in components[1:]:
+            if bw * bh < self.min_area * mask.size:
+                continue
+            boxes.append({
+                "label": "image",
+                "score": round(0.5 + 0.49 * area / (bw * bh), 3),
+                "coordinate": [x / scale, y / scale, (x + bw) / scale, (y + bh) / scale],
+            })
+        return layout_from_boxes(boxes)
+
+    def detect(self, images: List[np.ndarray]) -> List[Dict]:
+        layouts = [self._detect_one(image) for image in images]
+        if self.latency_ms > 0:
+            time.sleep(self.latency_ms * len(images) / 1000)
+        return layouts
+
+    def fingerprint(self) -> str:
+        return f"fake:{self.max_side}:{self.min_area}"
+
+
+# 合成 PDF 循环使用的页面尺寸（pt）：Letter、A4、A3 横向、A5
+SYNTHETIC_PAGE_SIZES = [(612, 792), (595, 842), (1191, 842), (420, 595)]
+
+
+def _synthetic_raster(rng: np.random.Generator, width: int, height: int) -> bytes:
+    """平滑的彩色渐变 + 噪声位图（PNG 编码），模拟照片 / 可视化结果"""
+    yy, xx = np.mgrid[0:height, 0:width].astype(np.float32)
+    phase = rng.uniform(0, 2 * np.pi, size=3)
+    channels = [
+        127 + 100 * np.sin(xx / width * np.pi * 2 + phase[c]) * np.cos(yy / height * np.pi + phase[c])
+        for c in range(3)
+    ]
+    image = np.stack(channels, axis=2) + rng.normal(0, 12, size=(height, width, 3))
+    _, encoded = cv2.imencode(".png", np.clip(image, 0, 255).astype(np.uint8))
+    return encoded.tobytes()
+
+
+def _draw_vector_diagram(page: "fitz.Page", rect: "fitz.Rect", rng: np.random.Generator) -> None:
+    """浅色底板上若干彩色模块与连线，模拟矢量架构图"""
+    page.draw_rect(rect, color=(0.3, 0.3, 0.6), fill=(0.85, 0.92, 1.0), width=1)
+    cols, rows = 4, 2
+    cell_w, cell_h = rect.width / cols, rect.height / rows
+    centers = []
+    for r in range(rows):
+        for c in range(cols):
+            box = fitz.Rect(
+                rect.x0 + c * cell_w + cell_w * 0.15, rect.y0 + r * cell_h + cell_h * 0.2,
+                rect.x0 + (c + 1) * cell_w - cell_w * 0.15, rect.y0 + (r + 1) * cell_h - cell_h * 0.2,
+            )
+            fill = tuple(float(v) for v in rng.uniform(0.3, 0.9, size=3))
+            page.draw_rect(box, color=(0, 0, 0), fill=fill, width=0.8)
+            centers.append(fitz.Point((box.x0 + box.x1) / 2, (box.y0 + box.y1) / 2))
+    for a, b in zip(centers, centers[1:]):
+        page.draw_line(a, b, color=(0.2, 0.2, 0.2), width=0.8)
+
+
+def make_synthetic_pdf(path: Path, pages: int, seed: int = 0) -> None:
+    """
+    生成用于离线基准的合成 PDF（同一 seed 输出一致）
+
+    页面尺寸循环使用 SYNTHETIC_PAGE_SIZES，内容按页轮换：
+    纯文本 / 矢量架构图 + "Figure N: Overview…" 图注 / 位图 / 位图与矢量图并存，每页都有正文文本块
+    """
+    rng = np.random.default_rng(seed)
+    doc = fitz.open()
+    text = "Lorem ipsum dolor sit amet, consectetur adipiscing elit, sed do eiusmod tempor. " * 12
+    for i in range(pages):
+        width, height = SYNTHETIC_PAGE_SIZES[i % len(SYNTHETIC_PAGE_SIZES)]
+        page = doc.new_page(width=width, height=height)
+        margin = width * 0.08
+        content = fitz.Rect(margin, height * 0.08, width - margin, height * 0.92)
+        kind = i % 4
+        body_top = content.y0
+        if kind in (1, 3):
+            figure = fitz.Rect(content.x0, content.y0, content.x1, content.y0 + content.height * 0.35)
+            if kind == 3:
+                figure.x1 = content.x0 + content.width * 0.55
+            _draw_vector_diagram(page, figure, rng)
+            page.insert_text(
+                (figure.x0, figure.y1 + 14), f"Figure {i + 1}: Overview of the proposed framework.", fontsize=9
+            )
+            body_top = figure.y1 + 28
+        if kind in (2, 3):
+            raster = fitz.Rect(content.x0 + content.width * 0.6, content.y0, content.x1, content.y0 + content.height * 0.3)
+            if kind == 2:
+                raster = fitz.Rect(content.x0 + content.width * 0.15, content.y0, content.x1 - content.width * 0.15,
+                                   content.y0 + content.height * 0.3)
+                body_top = raster.y1 + 20
+            page.insert_image(raster, stream=_synthetic_raster(rng, 480, 320))
+        # 双栏正文
+        gap = 12
+        column_w = (content.width - gap) / 2
+        for c in range(2):
+            x0 = content.x0 + c * (column_w + gap)
+            page.insert_textbox(fitz.Rect(x0, body_top, x0 + column_w, content.y1), text * 3, fontsize=8)
+    doc.save(str(path))
+    doc.close()
+
+
+def _git_revision() -> str:
+    """当前提交（不可用时为 "unknown"），写入 JSON 便于对比"""
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+            cwd=Path(__file__).resolve().parent,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def _compare_baseline(summary: Dict, baseline_path: str, max_slowdown: float) -> List[str]:
+    """与基线 JSON 对比吞吐与各阶段每页耗时，返回超出 max_slowdown（百分比）的问题"""
+    with open(baseline_path, "r", encoding="utf-8") as f:
+        baseline = json.load(f)
+    base = baseline["summary"]
+    print(f"\n对比基线 {baseline_path} (提交 {baseline['meta'].get('commit')})")
+    change = (summary["pages_per_s"] / base["pages_per_s"] - 1) * 100 if base["pages_per_s"] else 0.0
+    print(f"  吞吐       {base['pages_per_s']:8.2f} → {summary['pages_per_s']:8.2f} 页/秒  ({change:+.1f}%)")
+    for stage in PIPELINE_STAGES:
+        old = base["stages"].get(stage, {}).get("ms_per_page")
+        new = summary["stages"].get(stage, {}).get("ms_per_page")
+        if old is None or new is None:
+            continue
+        print(f"  {stage:14s} {old:8.2f} → {new:8.2f} ms/页")
+    print(f"  RSS 增量    {base['peak_rss_growth_mb']:8.1f} → {summary['peak_rss_growth_mb']:8.1f} MB")
+
+    failures = []
+    if max_slowdown is not None and -change > max_slowdown:
+        failures.append(f"吞吐下降 {-change:.1f}%，超过允许的 {max_slowdown:g}%")
+    if base.get("main_figures") and base["main_figures"] != summary["main_figures"]:
+        failures.append("主图与基线不一致")
+    return failures
+
+
+def bench_offline(args) -> None:
+    """
+    离线基准：合成 PDF（或指定的 PDF）+ FakeLayoutBackend，不需要模型文件
+
+    输出各阶段耗时（open / render / colour-convert / detect / crop / score / encode / write）、
+    页/秒与常驻内存增量，结果写入 --json-out；给出 --baseline 时与之前的 JSON 对比，
+    吞吐下降超过 --max-slowdown 或主图变化时以非零状态码退出。
+    encode / write 在后台线程中与其他阶段重叠，各阶段之和可能超过总耗时
+    """
+    workdir = Path(tempfile.mkdtemp(prefix="bench_offline_"))
+    pdfs = _collect_pdfs(args.pdfs)
+    if not pdfs:
+        for i in range(args.docs):
+            pdf = workdir / f"synthetic_{i}.pdf"
+            make_synthetic_pdf(pdf, args.pages, seed=i)
+            pdfs.append(pdf)
+
+    extractor = DocLayoutExtractor(
+        output_dir=str(workdir / "out"),
+        backend=FakeLayoutBackend(latency_ms=args.latency_ms),
+        encode_workers=args.encode_workers,
+        image_format=args.image_format,
+    )
+    extract_kwargs = dict(
+        max_pages=args.pages, dpi=args.dpi, detect_dpi=args.detect_dpi,
+        batch_size=args.batch_size, render_workers=args.render_workers,
+    )
+    extractor.extract_from_pdf(str(pdfs[0]), **extract_kwargs)  # 预热：首次导入 / 线程池创建不计入
+
+    runs = []
+    main_figures = {}
+    for _ in range(args.repeat):
+        stages: Dict[str, float] = {}
+        pages = 0
+        growth = 0.0
+        start = time.perf_counter()
+        for pdf in pdfs:
+            result = extractor.extract_from_pdf(str(pdf), **extract_kwargs)
+            stats = result["stats"]
+            pages += stats["pages_scanned"] + stats["pages_skipped_prefilter"]
+            if stats["peak_rss_mb"] is not None and stats["rss_start_mb"] is not None:
+                growth = max(growth, stats["peak_rss_mb"] - stats["rss_start_mb"])
+            for stage, timing in stats["timings"].items():
+                stages[stage] = stages.get(stage, 0.0) + timing["seconds"]
+            best = result["figures"][0] if result["figures"] else None
+            main_figures[pdf.name] = [best["page"], [round(v) for v in best["rect"]]] if best else None
+        runs.append({
+            "wall_s": time.perf_counter() - start, "pages": pages, "stages": stages, "peak_rss_growth_mb": growth,
+        })
+
+    # 取墙钟耗时居中的一轮作为汇总
+    median = sorted(runs, key=lambda r: r["wall_s"])[len(runs) // 2]
+    pages = median["pages"]
+    summary = {
+        "pages": pages,
+        "wall_s": round(median["wall_s"], 4),
+        "pages_per_s": round(pages / median["wall_s"], 3) if median["wall_s"] else 0.0,
+        "stages": {
+            stage: {
+                "seconds": round(seconds, 4),
+                "ms_per_page": round(seconds / pages * 1000, 3) if pages else None,
+            }
+            for stage, seconds in median["stages"].items()
+        },
+        "peak_rss_growth_mb": round(max(r["peak_rss_growth_mb"] for r in runs), 1),
+        "main_figures": main_figures,
+    }
+
+    print(f"{len(pdfs)} 个 PDF, {pages} 页, 重复 {args.repeat} 次（取中位）, 假检测延迟 {args.latency_ms:g} ms/页")
+    for stage, timing in summary["stages"].items():
+        share = timing["seconds"] / median["wall_s"] * 100 if median["wall_s"] else 0.0
+        print(f"  {stage:14s} {timing['seconds']:8.3f}s  {timing['ms_per_page']:8.2f} ms/页  {share:5.1f}%")
+    print(f"  {'total':14s} {median['wall_s']:8.3f}s  {summary['pages_per_s']:8.2f} 页/秒")
+    print(f"  RSS 增量峰值 {summary['peak_rss_growth_mb']:.1f} MB")
+
+    report = {
+        "meta": {
+            "commit": _git_revision(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "python": platform.python_version(),
+            "pymupdf": fitz.VersionBind,
+            "opencv": cv2.__version__,
+            "numpy": np.__version__,
+            "platform": platform.platform(),
+        },
+        "config": {
+            "pdfs": [str(p) for p in args.pdfs] or f"synthetic {args.docs}x{args.pages}",
+            "latency_ms": args.latency_ms,
+            "encode_workers": args.encode_workers,
+            "image_format": extractor.image_format,
+            "repeat": args.repeat,
+            **extract_kwargs,
+        },
+        "runs": [
+            dict(run, stages={s: round(v, 4) for s, v in run["stages"].items()}, wall_s=round(run["wall_s"], 4))
+            for run in runs
+        ],
+        "summary": summary,
+    }
+    if args.json_out:
+        Path(args.json_out).parent.mkdir(parents=True, exist_ok=True)
+        with open(args.json_out, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"  结果已写入 {args.json_out}")
+
+    failures = _compare_baseline(summary, args.baseline, args.max_slowdown) if args.baseline else []
+    shutil.rmtree(workdir, ignore_errors=True)
+    for failure in failures:
+        print(f"  ❌ {failure}")
+    if failures:
+        sys.exit(1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="DocLayout Extractor benchmarks")
+    parser.add_argument("--model-dir", default=None, help="PP-DocLayoutV2 model directory")
+    parser.add_argument("--device", default="cpu", help="Inference device")
+    parser.add_argument("--max-pages", type=int, default=10, help="Pages per PDF")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("two-dpi", help="Full-page high-DPI vs low-DPI detect + high-DPI crop")
+    p.add_argument("pdfs", nargs="+", help="PDF files or directories")
+    p.add_argument("--dpi", type=int, default=300, help="Output crop DPI")
+    p.add_argument("--detect-dpi", type=int, default=100, help="Layout detection DPI")
+    p.set_defaults(func=bench_two_dpi)
+
+    p = sub.add_parser("batch", help="Pages/sec at different detection batch sizes")
+    p.add_argument("pdfs", nargs="+", help="PDF files or directories")
+    p.add_argument("--dpi", type=int, default=300, help="Render DPI")
+    p.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 2, 4, 8], help="Batch sizes to compare")
+    p.set_defaults(func=bench_batch)
+
+    p = sub.add_parser("backends", help="Paddle vs ONNX Runtime / OpenCV parity and latency")
+    p.add_argument("pdfs", nargs="+", help="PDF files or directories")
+    p.add_argument("--dpi", type=int, default=300, help="Render DPI")
+    p.add_argument("--onnx", default=None,
+                   help="ONNX model path (default <model-dir>/inference.onnx); implies --fp32")
+    p.add_argument("--fp32", action="store_true", help="Also benchmark the fp32 ONNX model")
+    p.add_argument("--int8", action="store_true", help="Also benchmark the int8 dynamically quantised model")
+    p.add_argument("--opencv", action="store_true", help="Also benchmark the model-free OpenCV detector")
+    p.add_argument("--iou", type=float, default=0.9, help="IoU threshold for box parity")
+    p.set_defaults(func=bench_backends)
+
+    p = sub.add_parser("threads", help="Pages/sec for CPU thread / MKLDNN configurations")
+    p.add_argument("pdfs", nargs="+", help="PDF files or directories")
+    p.add_argument("--dpi", type=int, default=300, help="Render DPI")
+    p.add_argument("--configs", nargs="+", default=None,
+                   help="Configurations as THREADS[:on|off[:CACHE]], e.g. 1:on 4:on 4:off")
+    p.set_defaults(func=bench_threads)
+
+    p = sub.add_parser("render", help="Legacy vs copy-free buffer-reusing page rasterisation")
+    p.add_argument("pdfs", nargs="+", help="PDF files or directories")
+    p.add_argument("--dpi", type=int, default=300, help="Render DPI")
+    p.set_defaults(func=bench_render)
+
+    p = sub.add_parser("preprocess", help="Resize to model input before inference vs full-page input")
+    p.add_argument("pdfs", nargs="+", help="PDF files or directories")
+    p.add_argument("--dpi", type=int, default=300, help="Render DPI")
+    p.add_argument("--iou", type=float, default=0.9, help="IoU threshold for box parity")
+    p.set_defaults(func=bench_preprocess)
+
+    p = sub.add_parser("captions", help="Caption-first locator recall vs pages processed")
+    p.add_argument("pdfs", nargs="+", help="PDF files or directories")
+    p.add_argument("--iou", type=float, default=0.5, help="IoU threshold for matching the reference main figure")
+    p.set_defaults(func=bench_captions)
+
+    p = sub.add_parser("encoding", help="Output format size/latency and background encoding")
+    p.add_argument("pdfs", nargs="+", help="PDF files or directories")
+    p.add_argument("--dpi", type=int, default=300, help="Crop DPI")
+    p.add_argument("--formats", nargs="+", default=["png:1", "png:6", "png:9", "webp:80", "webp:95", "jpeg:85", "jpeg:95"],
+                   help="Formats as FORMAT[:QUALITY]; PNG quality is the compression level 0-9")
+    p.add_argument("--encode-workers", type=int, default=2, help="Background encoding threads to compare")
+    p.set_defaults(func=bench_encoding)
+
+    p = sub.add_parser("memory", help="Peak RSS on a synthetic large-page PDF with and without a memory budget")
+    p.add_argument("--budget-mb", type=float, default=256, help="Memory budget for page buffers")
+    p.add_argument("--pages", type=int, default=6, help="Pages in the synthetic PDF")
+    p.add_argument("--dpi", type=int, default=300, help="Render / crop DPI")
+    p.add_argument("--batch-size", type=int, default=4, help="Detection batch size")
+    p.add_argument("--render-workers", type=int, default=0, help="Render worker processes")
+    p.set_defaults(func=bench_memory)
+
+    p = sub.add_parser("render-workers", help="Serial vs pooled page rendering end to end with a fake detector")
+    p.add_argument("pdfs", nargs="*", help="PDF files or directories (default: generate synthetic PDFs)")
+    p.add_argument("--docs", type=int, default=4, help="Synthetic PDFs to generate")
+    p.add_argument("--pages", type=int, default=8, help="Pages per synthetic PDF (also max pages per PDF)")
+    p.add_argument("--workers", type=int, nargs="+", default=[1, 2], help="render_workers values to compare")
+    p.add_argument("--latency-ms", type=float, default=50.0, help="Simulated detector latency per page")
+    p.add_argument("--dpi", type=int, default=300, help="Render / crop DPI")
+    p.add_argument("--batch-size", type=int, default=1, help="Detection batch size")
+    p.add_argument("--repeat", type=int, default=3, help="Repetitions; the median run is reported")
+    p.set_defaults(func=bench_render_workers)
+
+    p = sub.add_parser("offline", help="Per-stage timings on synthetic PDFs with a fake detector (no model needed)")
+    p.add_argument("pdfs", nargs="*", help="PDF files or directories (default: generate synthetic PDFs)")
+    p.add_argument("--docs", type=int, default=4, help="Synthetic PDFs to generate")
+    p.add_argument("--pages", type=int, default=8, help="Pages per synthetic PDF (also max pages per PDF)")
+    p.add_argument("--latency-ms", type=float, default=0.0, help="Simulated detector latency per page")
+    p.add_argument("--dpi", type=int, default=300, help="Output crop DPI")
+    p.add_argument("--detect-dpi", type=int, default=None, help="Layout detection DPI")
+    p.add_argument("--batch-size", type=int, default=1, help="Detection batch size")
+    p.add_argument("--render-workers", type=int, default=0, help="Render worker processes")
+    p.add_argument("--encode-workers", type=int, default=2, help="Background encoding threads")
+    p.add_argument("--image-format", default=None, help="Output image format (png / webp / jpeg)")
+    p.add_argument("--repeat", type=int, default=3, help="Repetitions; the median run is reported")
+    p.add_argument("--json-out", default=None, help="Write results to this JSON file")
+    p.add_argument("--baseline", default=None, help="Previous --json-out file to compare against")
+    p.add_argument("--max-slowdown", type=float, default=None,
+                   help="Exit non-zero if pages/sec drops by more than this percentage vs --baseline")
+    p.set_defaults(func=bench_offline)
+
+    args = parser.parse_args()
+    logger.remove()
+    logger.add(sys.stderr, level="WARNING")
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
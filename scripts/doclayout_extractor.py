@@ -12,9 +12,25 @@ DocLayout Extractor - 基于 PP-DocLayoutV2 的论文图像提取器
 """
 
 import os
+import re
+import sys
 import json
+import time
+import argparse
+import importlib.util
+import hashlib
+import itertools
+import socket
+import struct
+import tempfile
+import threading
+import multiprocessing
+import multiprocessing.util
+from collections import deque
+from contextlib import contextmanager, nullcontext
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor, as_completed
 from pathlib import Path
-from typing import List, Dict, Optional, Tuple
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple, Union
 
 import cv2
 import numpy as np
@@ -26,6 +42,1106 @@ os.environ.setdefault("KMP_DUPLICATE_LIB_OK", "TRUE")
 
 # 默认模型路径
 DEFAULT_MODEL_DIR = "model"
+MODEL_FILES = ("inference.pdmodel", "inference.pdiparams", "inference.yml")
+
+# 设置为 1 时，导入本模块即预加载引擎（供 fork server 使用）
+PRELOAD_ENV = "DOC_LAYOUT_PRELOAD"
+# fork server 预加载时使用的 loguru 日志级别（由 create_worker_pool 传入）
+LOG_LEVEL_ENV = "DOC_LAYOUT_LOG_LEVEL"
+
+# PDF 原生候选（嵌入位图 / 矢量绘图簇）参数
+NATIVE_RASTER_CONFIDENCE = 0.9   # 嵌入位图作为候选时的等效检测置信度
+NATIVE_VECTOR_CONFIDENCE = 0.8   # 矢量绘图簇作为候选时的等效检测置信度
+NATIVE_MIN_SCORE = 110           # 原生候选最高分达到该值才认为可信，否则回退到神经网络检测
+NATIVE_CLUSTER_GAP = 6           # 矢量绘图聚类的合并间距（point）
+NATIVE_MIN_DRAWINGS = 8          # 矢量绘图簇至少包含的绘图数
+NATIVE_MAX_DRAWINGS = 5000       # 单页绘图过多时跳过聚类（交给检测模型）
+NATIVE_MIN_AREA = 0.005          # 候选区域占页面面积的最小比例，更小的视为图标 / 徽标
+NATIVE_CLUSTER_MASK_SCALE = 2    # 聚类掩码分辨率（px/point）
+NATIVE_CLUSTER_MASK_SIZE = 4096  # 聚类掩码最长边像素数上限（超出时降低分辨率）
+
+# 图注优先定位参数
+CAPTION_PATTERN = re.compile(r"^fig(?:ure|\.)?\s*(\d+)\s*[:.|]", re.IGNORECASE)
+CAPTION_KEYWORD_PATTERN = re.compile(
+    r"\b(overview|pipeline|framework|architecture|overall|structure|workflow)\b", re.IGNORECASE
+)
+CAPTION_BOOST = 40               # 候选框正下方紧跟架构类图注时的加分
+CAPTION_MAX_GAP = 36             # 候选框底边到图注顶边的最大距离（point）
+
+# 图形预过滤参数（判定页面不可能有图片时跳过渲染与检测）
+PREFILTER_MIN_IMAGE_AREA = 0.01      # 位图 / 渐变面积占页面比例不低于该值即保留
+PREFILTER_MIN_PATHS = 8              # 非细线矢量路径数不少于该值即保留
+PREFILTER_MIN_TEXT_COVERAGE = 0.25   # 文字覆盖率低于该值（大片空白）即保留
+
+# 输出图片格式：{格式: (扩展名, OpenCV 参数, 默认值)}；png 的参数为压缩级别 0-9，webp / jpeg 为质量 0-100
+IMAGE_FORMATS = {
+    "png": (".png", cv2.IMWRITE_PNG_COMPRESSION, 1),
+    "webp": (".webp", cv2.IMWRITE_WEBP_QUALITY, 90),
+    "jpeg": (".jpg", cv2.IMWRITE_JPEG_QUALITY, 90),
+}
+
+# 矢量图导出：区域内位图 / 渐变面积占比不超过该值、矢量路径不少于 VECTOR_MIN_PATHS 时输出裁剪后的 SVG
+VECTOR_MAX_RASTER_AREA = 0.05
+VECTOR_MIN_PATHS = 4
+VECTOR_MAX_SVG_BYTES = 2 * 1024 * 1024   # 超过该大小（如密集散点图）改回位图
+
+# 内存预算模式：每个在途页面缓冲区按 BGR 3 字节 / 像素计，另计渲染中的 MuPDF pixmap 与一份裁剪图副本
+PAGE_BYTES_PER_PIXEL = 3
+PAGE_TRANSIENT_BUFFERS = 2
+
+# 提取流程各阶段（StageTimer 记录的阶段名）
+PIPELINE_STAGES = ("open", "render", "colour-convert", "detect", "crop", "score", "encode", "write")
+
+# OpenCV 轻量检测后端参数（比例均相对页面短边）
+OPENCV_WORK_SIZE = 1024          # 检测前页面最长边缩放到的像素数
+OPENCV_MIN_AREA = 0.01           # 区域占页面面积的最小比例
+OPENCV_TEXT_HEIGHT = 0.025       # 高度不超过该值（且不过宽）的连通块视为字符，其余为图形笔画
+OPENCV_CLOSE_SIZE = 0.02         # 闭运算核边长，把相邻图形笔画连成区域
+OPENCV_MAX_TEXT_RATIO = 0.75     # 区域内字符墨迹占比高于该值且几乎没有彩色时判为正文
+OPENCV_MAX_RULE_RATIO = 0.9      # 图形墨迹几乎全是长横竖线且含字符时判为表格
+OPENCV_MIN_COLOUR_RATIO = 0.02   # 彩色像素占比不低于该值的区域不做正文 / 表格剔除
+
+# 同页重叠框合并参数
+MERGE_IOU_THRESHOLD = 0.5            # IoU 不低于该值的框合并
+MERGE_CONTAINMENT_THRESHOLD = 0.8    # 交集占较小框面积比例不低于该值（基本被包含）的框合并
+
+
+def _batched(iterable: Iterable, size: int) -> Iterator[List]:
+    """将可迭代对象按 size 切分为列表批次（最后一批可能不足 size）"""
+    batch = []
+    for item in iterable:
+        batch.append(item)
+        if len(batch) >= max(1, size):
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def parse_layout_result(res) -> Dict:
+    """将 LayoutDetection 单页推理结果解析为 {"images": [...], "captions": [...]}"""
+    # 获取 JSON 格式结果
+    json_result = res.json
+    if isinstance(json_result, str):
+        json_result = json.loads(json_result)
+    
+    return layout_from_boxes(json_result.get("res", {}).get("boxes", []))
+
+
+def layout_from_boxes(boxes: List[Dict]) -> Dict:
+    """
+    将 {"label", "score", "coordinate"} 形式的检测框整理为 {"images": [...], "captions": [...]}
+    （各检测后端共用的输出结构）
+    """
+    images = []
+    captions = []
+    
+    for box in boxes:
+        label = box.get("label", "").lower()
+        item = {
+            "label": label,
+            "score": box.get("score", 0),
+            "bbox": box.get("coordinate", []),
+        }
+        
+        # 只提取 image 类型（不包括 figure_title）
+        if label == "image":
+            images.append(item)
+        elif "title" in label or "caption" in label:
+            captions.append(item)
+    
+    return {"images": images, "captions": captions}
+
+
+def _overlap_mask(box: np.ndarray, boxes: np.ndarray, iou_threshold: float, containment_threshold: float) -> np.ndarray:
+    """box 与 boxes 中每个框逐一比较，返回 IoU 或包含度达到阈值的布尔掩码"""
+    ix = np.clip(np.minimum(box[2], boxes[:, 2]) - np.maximum(box[0], boxes[:, 0]), 0, None)
+    iy = np.clip(np.minimum(box[3], boxes[:, 3]) - np.maximum(box[1], boxes[:, 1]), 0, None)
+    inter = ix * iy
+    area = (box[2] - box[0]) * (box[3] - box[1])
+    areas = (boxes[:, 2] - boxes[:, 0]) * (boxes[:, 3] - boxes[:, 1])
+    with np.errstate(divide="ignore", invalid="ignore"):
+        iou = inter / (area + areas - inter)
+        containment = inter / np.minimum(area, areas)
+    return (inter > 0) & ((iou >= iou_threshold) | (containment >= containment_threshold))
+
+
+def merge_overlapping_boxes(
+    boxes: List[Dict],
+    iou_threshold: float = MERGE_IOU_THRESHOLD,
+    containment_threshold: float = MERGE_CONTAINMENT_THRESHOLD,
+) -> Tuple[List[Dict], int]:
+    """
+    合并同一页中互相重叠的检测框（多子图 figure 常被拆成多个框）
+
+    按置信度从高到低，每个保留框吸收与其 IoU / 包含度达到阈值的其余框并扩展为外接框，
+    扩展后继续吸收新产生重叠的框；合并后的框沿用最高置信度。
+
+    Returns:
+        (合并后的框列表, 被合并掉的框数)
+    """
+    boxes = [box for box in boxes if len(box["bbox"]) >= 4]
+    if len(boxes) < 2:
+        return boxes, 0
+    
+    order = sorted(range(len(boxes)), key=lambda i: -boxes[i]["score"])
+    boxes = [boxes[i] for i in order]
+    coords = np.array([box["bbox"][:4] for box in boxes], dtype=np.float64)
+    alive = np.ones(len(boxes), dtype=bool)
+    
+    merged = []
+    for i, box in enumerate(boxes):
+        if not alive[i]:
+            continue
+        alive[i] = False
+        rect = coords[i].copy()
+        absorbed = 0
+        while True:
+            mask = alive & _overlap_mask(rect, coords, iou_threshold, containment_threshold)
+            if not mask.any():
+                break
+            members = coords[mask]
+            rect[:2] = np.minimum(rect[:2], members[:, :2].min(axis=0))
+            rect[2:] = np.maximum(rect[2:], members[:, 2:].max(axis=0))
+            alive &= ~mask
+            absorbed += int(mask.sum())
+        merged.append(dict(box, bbox=rect.tolist()) if absorbed else box)
+    return merged, len(boxes) - len(merged)
+
+
+# 模型指纹缓存：{(文件路径, 文件大小与修改时间): 指纹}
+_model_fingerprints: Dict[Tuple, str] = {}
+
+
+def _files_fingerprint(files: List[Path]) -> str:
+    """
+    一组文件内容（含文件名，缺失的文件只计文件名）的 SHA-256 指纹
+
+    同一进程内按文件大小与修改时间记忆，文件不变时只计算一次
+    """
+    stamp = tuple(
+        (str(f.resolve()), f.stat().st_size, f.stat().st_mtime_ns) if f.exists() else (str(f.resolve()), None, None)
+        for f in files
+    )
+    if stamp not in _model_fingerprints:
+        h = hashlib.sha256()
+        for f in files:
+            h.update(f.name.encode("utf-8"))
+            if f.exists():
+                with open(f, "rb") as fh:
+                    for chunk in iter(lambda: fh.read(1 << 20), b""):
+                        h.update(chunk)
+        _model_fingerprints[stamp] = h.hexdigest()
+    return _model_fingerprints[stamp]
+
+
+def _model_fingerprint(model_dir: Path) -> str:
+    """Paddle 模型文件（MODEL_FILES）内容的 SHA-256 指纹（用于检测缓存键）"""
+    return _files_fingerprint([Path(model_dir) / name for name in MODEL_FILES])
+
+
+class StageTimer:
+    """
+    按阶段累计耗时（秒）与次数
+
+    线程安全：主流程与后台编码线程可同时记录。阶段名见 PIPELINE_STAGES
+    """
+
+    def __init__(self):
+        self._seconds: Dict[str, float] = {}
+        self._calls: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def add(self, stage: str, seconds: float):
+        with self._lock:
+            self._seconds[stage] = self._seconds.get(stage, 0.0) + seconds
+            self._calls[stage] = self._calls.get(stage, 0) + 1
+
+    @contextmanager
+    def measure(self, stage: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(stage, time.perf_counter() - start)
+
+    def as_dict(self) -> Dict[str, Dict]:
+        """{阶段: {"seconds": float, "calls": int}}，按 PIPELINE_STAGES 顺序"""
+        with self._lock:
+            order = [s for s in PIPELINE_STAGES if s in self._seconds]
+            order += [s for s in self._seconds if s not in PIPELINE_STAGES]
+            return {
+                s: {"seconds": round(self._seconds[s], 6), "calls": self._calls[s]} for s in order
+            }
+
+
+def _timed(timer: Optional[StageTimer], stage: str):
+    """timer 为 None 时不计时"""
+    return timer.measure(stage) if timer is not None else nullcontext()
+
+
+class PageBufferRing:
+    """
+    轮转复用的整页 BGR 缓冲区
+
+    slots 个缓冲区依次出借：第 n 次 take 返回的数组在第 n + slots 次 take 之后会被覆盖，
+    因此 slots 应不小于同时驻留的页面数（如检测批大小）。需要长期保留的像素（裁剪图等）
+    必须由调用方自行 copy。缓冲区只增不减，页面尺寸变小时复用已有内存的前缀。
+    """
+
+    def __init__(self, slots: int = 1):
+        self._buffers: List[Optional[np.ndarray]] = [None] * max(1, slots)
+        self._next = 0
+        self.allocations = 0  # 实际分配次数（用于基准测试核对复用情况）
+
+    def take(self, shape: Tuple[int, ...]) -> np.ndarray:
+        """借出一块形状为 shape 的 uint8 缓冲区（内容未初始化）"""
+        size = int(np.prod(shape))
+        buf = self._buffers[self._next]
+        if buf is None or buf.size < size:
+            buf = np.empty(size, dtype=np.uint8)
+            self._buffers[self._next] = buf
+            self.allocations += 1
+        self._next = (self._next + 1) % len(self._buffers)
+        return buf[:size].reshape(shape)
+
+
+def _render_page_bgr(
+    page: "fitz.Page",
+    dpi: int = 300,
+    clip: Optional["fitz.Rect"] = None,
+    buffers: Optional[PageBufferRing] = None,
+    timer: Optional[StageTimer] = None,
+) -> np.ndarray:
+    """
+    将页面（或 clip 指定的 PDF 坐标区域）渲染为 BGR 图像
+
+    直接让 MuPDF 输出不带 alpha 的 RGB，通过 samples_mv 零拷贝地把 pixmap 内存视为 numpy 数组，
+    再用一次 cvtColor 通道交换写入目标缓冲区。仍然存在的拷贝：
+    - MuPDF 光栅化本身写入 pixmap（每页一次分配，PyMuPDF 不支持渲染到外部内存）
+    - RGB -> BGR 通道交换（写入 buffers 借出的缓冲区；未提供 buffers 时新分配一张）
+
+    Args:
+        page: PDF 页面
+        dpi: 渲染分辨率
+        clip: PDF 坐标下的渲染区域，None 为整页
+        buffers: 提供时输出写入其中复用的缓冲区（返回值在缓冲区被再次借出前有效）
+        timer: 提供时分别记录 "render"（光栅化）与 "colour-convert"（通道交换）耗时
+    """
+    zoom = dpi / 72
+    mat = fitz.Matrix(zoom, zoom)
+    with _timed(timer, "render"):
+        pix = page.get_pixmap(matrix=mat, clip=clip, colorspace=fitz.csRGB, alpha=False)
+    shape = (pix.height, pix.width, 3)
+    rgb = np.ndarray(shape, dtype=np.uint8, buffer=pix.samples_mv, strides=(pix.stride, 3, 1))
+    with _timed(timer, "colour-convert"):
+        out = buffers.take(shape) if buffers is not None else None
+        img = cv2.cvtColor(rgb, cv2.COLOR_RGB2BGR, dst=out)
+    del rgb  # 先释放视图，再释放 pixmap
+    return img
+
+
+def resize_to_model_input(
+    image: np.ndarray, input_size: Tuple[int, int]
+) -> Tuple[np.ndarray, Tuple[float, float]]:
+    """
+    将页面图像一次性缩放到模型输入尺寸
+
+    PP-DocLayoutV2 预处理会把输入拉伸到固定的 (高, 宽)；提前用 INTER_LINEAR 缩小（约为整页双三次插值
+    一半的耗时），引擎内部的缩放就变成同尺寸，后续流程与传输也只处理小图。图像不大于输入尺寸时原样返回。
+
+    Returns:
+        (缩放后的图像, (x 方向还原系数, y 方向还原系数))
+    """
+    h, w = image.shape[:2]
+    target_h, target_w = input_size
+    if h <= target_h and w <= target_w:
+        return image, (1.0, 1.0)
+    resized = cv2.resize(image, (target_w, target_h), interpolation=cv2.INTER_LINEAR)
+    return resized, (w / target_w, h / target_h)
+
+
+def _scale_layout(layout: Dict, fx: float, fy: float) -> Dict:
+    """将布局结果中所有框的坐标按 (fx, fy) 缩放（x 坐标乘 fx，y 坐标乘 fy）"""
+    if fx == 1.0 and fy == 1.0:
+        return layout
+    return {
+        key: [
+            dict(item, bbox=[v * (fy if i % 2 else fx) for i, v in enumerate(item["bbox"])])
+            for item in items
+        ]
+        for key, items in layout.items()
+    }
+
+
+# 渲染 worker 进程内的文档句柄（同一 PDF 的连续任务复用，换 PDF 时重新打开）
+_worker_doc = None
+_worker_doc_path: Optional[str] = None
+
+
+class _SharedMemoryBuffer:
+    """把一段共享内存当作单槽缓冲区借给 _render_page_bgr（接口同 PageBufferRing.take）"""
+
+    def __init__(self, buf: memoryview):
+        self._buf = buf
+        self.fits = True
+
+    def take(self, shape: Tuple[int, ...]) -> np.ndarray:
+        size = int(np.prod(shape))
+        if size > len(self._buf):
+            # 槽位不够大（主进程预估的页面尺寸有误）：退回普通分配，由主进程重新渲染
+            self.fits = False
+            return np.empty(shape, dtype=np.uint8)
+        return np.ndarray(shape, dtype=np.uint8, buffer=self._buf)
+
+
+def _render_page_worker(pdf_path: str, page_idx: int, dpi: int, shm_name: str) -> Optional[Tuple[int, int, int]]:
+    """
+    渲染进程任务：把单页 BGR 图像直接写入主进程分配的共享内存槽，只回传形状（不经 pickle 传像素）
+
+    槽位不够大时返回 None
+    """
+    from multiprocessing import shared_memory
+
+    global _worker_doc, _worker_doc_path
+    if _worker_doc_path != pdf_path:
+        if _worker_doc is not None:
+            _worker_doc.close()
+        _worker_doc = fitz.open(pdf_path)
+        _worker_doc_path = pdf_path
+    
+    # 共享内存由主进程创建与 unlink；spawn 的 worker 与主进程共用 resource_tracker，重复登记无副作用
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        target = _SharedMemoryBuffer(shm.buf)
+        image = _render_page_bgr(_worker_doc[page_idx], dpi=dpi, buffers=target)
+        shape = image.shape if target.fits else None
+        del image, target  # 先释放共享内存上的视图，才能 close
+        return shape
+    finally:
+        shm.close()
+
+
+class _SharedPageSlots:
+    """
+    渲染进程池回传页面用的共享内存槽，按页序轮转（语义同 PageBufferRing）
+
+    第 n 次 reserve 的槽位在第 n + slots 次 reserve 时被覆盖；槽位只增不减。
+    页面变大而换下的旧槽位在 close 时统一释放（其上可能仍有调用方未释放的视图）
+    """
+
+    def __init__(self, slots: int):
+        self._slots: List = [None] * max(1, slots)
+        self._retired: List = []
+        self._next = 0
+
+    def ensure_slots(self, slots: int):
+        """槽位数不少于 slots；数量变化时从头轮转（只在两次提取之间调用）"""
+        if slots > len(self._slots):
+            self._slots.extend([None] * (slots - len(self._slots)))
+        self._next = 0
+
+    def reserve(self, nbytes: int) -> Tuple[int, str]:
+        """借出下一个至少 nbytes 字节的槽位，返回 (槽位序号, 共享内存名称)"""
+        from multiprocessing import shared_memory
+
+        idx = self._next
+        shm = self._slots[idx]
+        if shm is None or shm.size < nbytes:
+            if shm is not None:
+                self._retired.append(shm)
+            shm = shared_memory.SharedMemory(create=True, size=max(1, nbytes))
+            self._slots[idx] = shm
+        self._next = (idx + 1) % len(self._slots)
+        return idx, shm.name
+
+    def view(self, idx: int, shape: Tuple[int, ...]) -> np.ndarray:
+        """槽位上形状为 shape 的 uint8 数组视图（不复制）"""
+        return np.ndarray(shape, dtype=np.uint8, buffer=self._slots[idx].buf)
+
+    def close(self):
+        for shm in [s for s in self._slots if s is not None] + self._retired:
+            try:
+                shm.close()
+            except BufferError:
+                pass  # 调用方仍持有视图：映射随视图回收，名称照常删除
+            try:
+                shm.unlink()
+            except FileNotFoundError:
+                pass
+        self._slots = [None] * len(self._slots)
+        self._retired = []
+
+
+def _read_proc_status_mb(field: str) -> Optional[float]:
+    """读取 /proc/self/status 中以 kB 为单位的字段（如 VmRSS / VmHWM），返回 MB"""
+    try:
+        with open("/proc/self/status", "r") as f:
+            for line in f:
+                if line.startswith(field + ":"):
+                    return int(line.split()[1]) / 1024
+    except (OSError, ValueError, IndexError):
+        pass
+    return None
+
+
+def current_rss_mb() -> Optional[float]:
+    """本进程当前的常驻内存（MB），非 Linux 返回 None"""
+    return _read_proc_status_mb("VmRSS")
+
+
+def peak_rss_mb() -> Optional[float]:
+    """本进程的常驻内存峰值（MB）：Linux 读 VmHWM，其他平台退回 getrusage"""
+    peak = _read_proc_status_mb("VmHWM")
+    if peak is not None:
+        return peak
+    try:
+        import resource
+    except ImportError:
+        return None
+    # ru_maxrss 在 Linux 上以 KB 计，在 macOS 上以字节计
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return maxrss / 1024 / 1024 if sys.platform == "darwin" else maxrss / 1024
+
+
+def reset_peak_rss() -> bool:
+    """将 VmHWM 重置为当前 RSS（Linux 4.0+ 的 /proc/self/clear_refs），不支持时返回 False"""
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+        return True
+    except OSError:
+        return False
+
+
+def _rect_components(rects: List["fitz.Rect"], gap: float) -> List[int]:
+    """
+    矩形各向外扩 gap/2 后画进掩码，返回每个矩形所属的连通域编号（相互接触的矩形编号相同）
+
+    掩码按像素中心取样，分辨率 NATIVE_CLUSTER_MASK_SCALE px/point，实际合并间距比 gap 至多大一个像素
+    """
+    coords = np.array([(r.x0, r.y0, r.x1, r.y1) for r in rects], dtype=np.float64)
+    coords[:, :2] -= gap / 2
+    coords[:, 2:] += gap / 2
+    origin = coords[:, :2].min(axis=0)
+    extent = coords[:, 2:].max(axis=0) - origin
+    scale = min(float(NATIVE_CLUSTER_MASK_SCALE), NATIVE_CLUSTER_MASK_SIZE / max(float(extent.max()), 1.0))
+    
+    # 像素 i 的中心 i + 0.5 落在扩展后的矩形内才填充，至少填一个像素
+    starts = np.ceil((coords[:, :2] - origin) * scale - 0.5).astype(np.int64)
+    ends = np.maximum(np.floor((coords[:, 2:] - origin) * scale - 0.5).astype(np.int64) + 1, starts + 1)
+    mask = np.zeros((int(ends[:, 1].max()) + 1, int(ends[:, 0].max()) + 1), dtype=np.uint8)
+    for (x0, y0), (x1, y1) in zip(starts.tolist(), ends.tolist()):
+        mask[y0:y1, x0:x1] = 1
+    
+    # 4 连通：只在角上相接的矩形不算相交
+    _, labels = cv2.connectedComponents(mask, connectivity=4)
+    return labels[starts[:, 1], starts[:, 0]].tolist()
+
+
+def _cluster_rects(rects: List["fitz.Rect"], gap: float) -> List[Tuple["fitz.Rect", List["fitz.Rect"]]]:
+    """
+    将间距不超过 gap 的矩形合并成簇
+
+    用掩码连通域（_rect_components）一次找出相连的矩形，耗时随矩形数近似线性；
+    合并后的外接矩形可能又与其他簇相交，因此以簇外接矩形为单位重复，直到簇数不再减少
+
+    返回: [(簇外接矩形, 簇内矩形列表), ...]
+    """
+    # 零宽 / 零高的直线也参与聚类，外接矩形按坐标直接取并（fitz.Rect 的 | 会忽略空矩形）
+    clusters = [(r, [r]) for r in rects if not r.is_infinite]
+    
+    while len(clusters) > 1:
+        groups: Dict[int, List[Tuple["fitz.Rect", List["fitz.Rect"]]]] = {}
+        for label, cluster in zip(_rect_components([bbox for bbox, _ in clusters], gap), clusters):
+            groups.setdefault(label, []).append(cluster)
+        if len(groups) == len(clusters):
+            break
+        clusters = []
+        for group in groups.values():
+            if len(group) == 1:
+                clusters.append(group[0])
+                continue
+            bbox = fitz.Rect(min(b.x0 for b, _ in group), min(b.y0 for b, _ in group),
+                             max(b.x1 for b, _ in group), max(b.y1 for b, _ in group))
+            clusters.append((bbox, [r for _, members in group for r in members]))
+    return clusters
+
+
+def _svg_export_supported() -> bool:
+    """矢量图导出需要 apply_redactions 的 graphics 参数移除区域外的路径（PyMuPDF 1.24.2 起支持）"""
+    return hasattr(fitz, "PDF_REDACT_LINE_ART_REMOVE_IF_COVERED")
+
+
+def _env_bool(name: str) -> Optional[bool]:
+    value = os.getenv(name)
+    if value is None or value == "":
+        return None
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
+def _env_int(name: str) -> Optional[int]:
+    value = os.getenv(name)
+    return int(value) if value else None
+
+
+def default_cpu_threads(workers: Optional[int] = None) -> int:
+    """
+    每个推理引擎的默认 CPU 线程数：可用 CPU 数（os.sched_getaffinity）平分给同机的 worker
+
+    Args:
+        workers: 同机并行的 worker 数（默认读取 DOC_LAYOUT_WORKERS 环境变量，未设置为 1）
+    """
+    try:
+        available = len(os.sched_getaffinity(0))
+    except AttributeError:  # 非 Linux 平台
+        available = os.cpu_count() or 1
+    workers = workers or _env_int("DOC_LAYOUT_WORKERS") or 1
+    return max(1, available // max(1, workers))
+
+
+def resolve_cpu_options(
+    cpu_threads: Optional[int] = None,
+    enable_mkldnn: Optional[bool] = None,
+    mkldnn_cache_capacity: Optional[int] = None,
+) -> Dict:
+    """
+    合并 CPU 推理选项：显式参数 > 环境变量 > 默认值
+
+    环境变量：DOC_LAYOUT_CPU_THREADS / DOC_LAYOUT_MKLDNN（0 或 1）/ DOC_LAYOUT_MKLDNN_CACHE
+    """
+    if cpu_threads is None:
+        cpu_threads = _env_int("DOC_LAYOUT_CPU_THREADS") or default_cpu_threads()
+    if enable_mkldnn is None:
+        enable_mkldnn = _env_bool("DOC_LAYOUT_MKLDNN")
+        enable_mkldnn = True if enable_mkldnn is None else enable_mkldnn
+    if mkldnn_cache_capacity is None:
+        mkldnn_cache_capacity = _env_int("DOC_LAYOUT_MKLDNN_CACHE") or 10
+    return {
+        "cpu_threads": cpu_threads,
+        "enable_mkldnn": enable_mkldnn,
+        "mkldnn_cache_capacity": mkldnn_cache_capacity,
+    }
+
+
+# 进程级引擎注册表：{(模型目录, 设备, CPU 选项): LayoutDetection}
+_engine_registry: Dict[Tuple, object] = {}
+_engine_lock = threading.Lock()
+
+
+def get_layout_engine(
+    model_dir: Optional[str] = None, device: str = "cpu", cpu_options: Optional[Dict] = None
+):
+    """
+    获取（必要时加载）进程内共享的 LayoutDetection 引擎
+
+    Args:
+        model_dir: 模型目录（默认读取 DOC_LAYOUT_MODEL_DIR 环境变量）
+        device: 推理设备
+        cpu_options: CPU 推理选项（见 resolve_cpu_options），为 None 时按环境变量 / 默认值解析；
+                     仅在 device 为 CPU 时生效
+    """
+    model_dir = Path(model_dir or os.getenv("DOC_LAYOUT_MODEL_DIR", DEFAULT_MODEL_DIR))
+    options = {}
+    if device.startswith("cpu"):
+        options = resolve_cpu_options(**(cpu_options or {}))
+    key = (str(model_dir.resolve()), device, tuple(sorted(options.items())))
+    with _engine_lock:
+        if key not in _engine_registry:
+            from paddleocr import LayoutDetection
+
+            # 检查模型文件
+            missing = [f for f in MODEL_FILES if not (model_dir / f).exists()]
+            if missing:
+                raise FileNotFoundError(
+                    f"模型文件缺失: {missing}\n"
+                    f"请下载模型文件到 {model_dir}/ 目录，参考 README.md"
+                )
+
+            logger.info(f"初始化 LayoutDetection (本地 PP-DocLayoutV2) {options}...")
+            _engine_registry[key] = LayoutDetection(
+                model_name="PP-DocLayoutV2",
+                model_dir=str(model_dir),
+                device=device,
+                **options,
+            )
+            logger.success("LayoutDetection 初始化完成")
+        return _engine_registry[key]
+
+
+def preload_engine(
+    model_dir: Optional[str] = None, device: str = "cpu", cpu_options: Optional[Dict] = None
+):
+    """预加载共享引擎（fork 之前调用，子进程以写时复制方式共享模型权重）"""
+    return get_layout_engine(model_dir, device, cpu_options)
+
+
+def _cpu_options_env(cpu_options: Dict) -> Dict[str, str]:
+    """CPU 推理选项对应的环境变量（供子进程中按默认参数创建的提取器解析出相同配置）"""
+    env = {}
+    if cpu_options.get("cpu_threads") is not None:
+        env["DOC_LAYOUT_CPU_THREADS"] = str(cpu_options["cpu_threads"])
+    if cpu_options.get("enable_mkldnn") is not None:
+        env["DOC_LAYOUT_MKLDNN"] = "1" if cpu_options["enable_mkldnn"] else "0"
+    if cpu_options.get("mkldnn_cache_capacity") is not None:
+        env["DOC_LAYOUT_MKLDNN_CACHE"] = str(cpu_options["mkldnn_cache_capacity"])
+    return env
+
+
+def _configure_worker_logging(log_level: Optional[str]):
+    """子进程的日志级别与主进程一致（forkserver / spawn 启动的进程不继承主进程的 loguru 配置）"""
+    if log_level:
+        logger.remove()
+        logger.add(sys.stderr, level=log_level)
+
+
+def _init_engine_worker(
+    model_dir: Optional[str], device: str, cpu_options: Optional[Dict], log_level: Optional[str] = None
+):
+    """worker 进程初始化：设置日志级别，确保引擎已加载（fork / forkserver 继承时为空操作）"""
+    _configure_worker_logging(log_level)
+    os.environ.update(_cpu_options_env(cpu_options or {}))
+    try:
+        preload_engine(model_dir, device, cpu_options)
+    except (FileNotFoundError, ImportError) as e:
+        # 不让整个进程池失效：提取器创建后端时按 fallback 设置改用 OpenCV 检测或报错
+        logger.warning(f"worker 预加载引擎失败: {e}")
+
+
+def _start_preloaded_forkserver(
+    ctx, model_dir: Optional[str], device: str, cpu_options: Dict, workers: int,
+    log_level: Optional[str] = None,
+):
+    """
+    启动会预加载引擎的 fork server
+
+    fork server 启动时继承当前环境变量并导入本模块，模块末尾检测到 PRELOAD_ENV 即加载引擎；
+    启动后立即恢复环境变量，避免影响之后创建的其他子进程。
+    fork server 在进程内只启动一次，若此前已启动则不会再预加载。
+    """
+    from multiprocessing import forkserver
+
+    env = {
+        PRELOAD_ENV: "1",
+        "DOC_LAYOUT_DEVICE": device,
+        "DOC_LAYOUT_WORKERS": str(workers),
+    }
+    if model_dir:
+        env["DOC_LAYOUT_MODEL_DIR"] = str(Path(model_dir).resolve())
+    if log_level:
+        env[LOG_LEVEL_ENV] = log_level
+    env.update(_cpu_options_env(cpu_options))
+    
+    if __name__ in ("__main__", "__mp_main__"):
+        # 作为脚本运行时本模块是 __main__，fork server 以 __mp_main__ 名义导入
+        preload = ["__main__"]
+    else:
+        # fork server 不继承调用方的 sys.path，通过 PYTHONPATH 保证本模块可导入
+        package_root = Path(__file__).resolve().parents[__name__.count(".")]
+        env["PYTHONPATH"] = os.pathsep.join(filter(None, [str(package_root), os.getenv("PYTHONPATH")]))
+        preload = [__name__]
+    
+    saved = {k: os.environ.get(k) for k in env}
+    os.environ.update(env)
+    ctx.set_forkserver_preload(preload)
+    try:
+        forkserver.ensure_running()
+    finally:
+        for k, v in saved.items():
+            if v is None:
+                os.environ.pop(k, None)
+            else:
+                os.environ[k] = v
+
+
+def create_worker_pool(
+    workers: int,
+    model_dir: Optional[str] = None,
+    device: str = "cpu",
+    start_method: str = "forkserver",
+    cpu_options: Optional[Dict] = None,
+    log_level: Optional[str] = None,
+) -> ProcessPoolExecutor:
+    """
+    创建带预热引擎的进程池，批量任务只付一次模型初始化开销
+
+    Args:
+        workers: 进程数
+        model_dir: 模型目录
+        device: 推理设备
+        start_method:
+            - "forkserver": fork server 导入本模块时预加载引擎，worker 从 fork server 派生，
+                            共享已加载的权重（写时复制），且不继承调用方的线程状态
+            - "fork": 在当前进程预加载后直接 fork（仅适用于尚未运行过推理的进程）
+            - "spawn": 每个 worker 各自加载一次引擎
+        cpu_options: CPU 推理选项；未指定线程数时按 workers 平分可用 CPU，避免超额订阅
+        log_level: worker（及 fork server）的 loguru 日志级别；为 None 时保留 loguru 默认配置
+    """
+    cpu_options = dict(cpu_options or {})
+    if cpu_options.get("cpu_threads") is None and not os.getenv("DOC_LAYOUT_CPU_THREADS"):
+        cpu_options["cpu_threads"] = default_cpu_threads(workers)
+    
+    ctx = multiprocessing.get_context(start_method)
+    if start_method == "forkserver":
+        _start_preloaded_forkserver(ctx, model_dir, device, cpu_options, workers, log_level)
+    elif start_method == "fork":
+        preload_engine(model_dir, device, cpu_options)
+    return ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=ctx,
+        initializer=_init_engine_worker,
+        initargs=(model_dir, device, cpu_options, log_level),
+    )
+
+
+def _send_message(sock: socket.socket, obj) -> None:
+    """发送一条长度前缀（4 字节大端）+ JSON 的消息"""
+    data = json.dumps(obj, separators=(",", ":")).encode("utf-8")
+    sock.sendall(struct.pack(">I", len(data)) + data)
+
+
+def _recv_exact(sock: socket.socket, size: int) -> bytes:
+    buf = bytearray()
+    while len(buf) < size:
+        chunk = sock.recv(size - len(buf))
+        if not chunk:
+            raise ConnectionError("连接已关闭")
+        buf.extend(chunk)
+    return bytes(buf)
+
+
+def _recv_message(sock: socket.socket):
+    """接收一条 _send_message 格式的消息"""
+    (size,) = struct.unpack(">I", _recv_exact(sock, 4))
+    return json.loads(_recv_exact(sock, size).decode("utf-8"))
+
+
+class LayoutBackend:
+    """
+    布局检测后端接口
+
+    detect() 接收一批 BGR 页面图像，返回与输入顺序一致的
+    [{"images": [...], "captions": [...]}, ...]，框坐标基于输入图像像素
+    """
+
+    name = "base"
+    # 检测前是否按 inference.yml 的模型输入尺寸缩放（见 DocLayoutExtractor.detect_input_size）
+    model_input = True
+
+    def detect(self, images: List[np.ndarray]) -> List[Dict]:
+        raise NotImplementedError
+
+    def fingerprint(self) -> str:
+        """检测结果缓存键的一部分：后端与模型不变时保持不变"""
+        return self.name
+
+
+class PaddleLayoutBackend(LayoutBackend):
+    """PaddleOCR LayoutDetection 推理后端（默认）"""
+
+    name = "paddle"
+
+    def __init__(self, model_dir: Path, device: str = "cpu", cpu_options: Optional[Dict] = None):
+        self.model_dir = Path(model_dir)
+        self.device = device
+        self.cpu_options = cpu_options
+
+    @property
+    def engine(self):
+        return get_layout_engine(self.model_dir, self.device, self.cpu_options)
+
+    def detect(self, images: List[np.ndarray]) -> List[Dict]:
+        results = list(self.engine.predict(images, batch_size=len(images)))
+        if len(results) != len(images):
+            raise RuntimeError(f"批量检测结果数量不匹配: 输入 {len(images)}, 输出 {len(results)}")
+        return [parse_layout_result(res) for res in results]
+
+    def fingerprint(self) -> str:
+        return _model_fingerprint(self.model_dir)
+
+
+class OnnxLayoutBackend(LayoutBackend):
+    """
+    ONNX Runtime 推理后端（CPU）
+
+    需要先用 paddle2onnx 将 PP-DocLayoutV2 导出到 model_dir/inference.onnx：
+        paddle2onnx --model_dir model --model_filename inference.pdmodel \\
+                    --params_filename inference.pdiparams --save_file model/inference.onnx
+    预处理参数（输入尺寸、归一化）与类别表读取自 inference.yml，输出与 Paddle 后端相同的框结构。
+    quantize=True 时使用 int8 动态量化模型（首次使用时生成 inference.int8.onnx）。
+    """
+
+    name = "onnx"
+
+    def __init__(
+        self,
+        model_dir: Path,
+        onnx_path: Optional[str] = None,
+        quantize: bool = False,
+        threshold: Optional[float] = None,
+        intra_op_threads: int = 0,
+    ):
+        self.model_dir = Path(model_dir)
+        self.onnx_path = Path(onnx_path) if onnx_path else self.model_dir / "inference.onnx"
+        if quantize:
+            self.onnx_path = quantize_onnx_model(self.onnx_path)
+        self.intra_op_threads = intra_op_threads
+        self._session = None
+        
+        config = _load_inference_config(self.model_dir)
+        self.labels = config["labels"]
+        self.target_size = config["target_size"]
+        self.interpolation = config["interpolation"]
+        self.mean = np.array(config["mean"], dtype=np.float32)
+        self.std = np.array(config["std"], dtype=np.float32)
+        self.scale = config["scale"]
+        self.threshold = config["threshold"] if threshold is None else threshold
+        self.name = "onnx-int8" if quantize else "onnx"
+
+    @property
+    def session(self):
+        """延迟创建 ONNX Runtime 会话"""
+        if self._session is None:
+            import onnxruntime as ort
+
+            if not self.onnx_path.exists():
+                raise FileNotFoundError(
+                    f"ONNX 模型不存在: {self.onnx_path}\n请先用 paddle2onnx 导出，参考 OnnxLayoutBackend 说明"
+                )
+            options = ort.SessionOptions()
+            options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+            if self.intra_op_threads:
+                options.intra_op_num_threads = self.intra_op_threads
+            logger.info(f"初始化 ONNX Runtime 会话: {self.onnx_path.name}")
+            self._session = ort.InferenceSession(
+                str(self.onnx_path), sess_options=options, providers=["CPUExecutionProvider"]
+            )
+        return self._session
+
+    def _preprocess(self, image: np.ndarray) -> Tuple[np.ndarray, List[float]]:
+        """BGR 页面 -> (CHW float32, [scale_y, scale_x])"""
+        h, w = image.shape[:2]
+        target_h, target_w = self.target_size
+        rgb = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+        resized = cv2.resize(rgb, (target_w, target_h), interpolation=self.interpolation)
+        tensor = (resized.astype(np.float32) * self.scale - self.mean) / self.std
+        return tensor.transpose(2, 0, 1), [target_h / h, target_w / w]
+
+    def _run(self, batch: np.ndarray, scale_factors: np.ndarray) -> List[List[Dict]]:
+        """执行一次推理，返回每张图的 {"label", "score", "coordinate"} 列表"""
+        n = batch.shape[0]
+        feeds = {}
+        for inp in self.session.get_inputs():
+            if inp.name == "image":
+                feeds[inp.name] = batch
+            elif inp.name == "im_shape":
+                feeds[inp.name] = np.array([self.target_size] * n, dtype=np.float32)
+            elif inp.name == "scale_factor":
+                feeds[inp.name] = scale_factors
+        outputs = self.session.run(None, feeds)
+        dets, counts = outputs[0], outputs[1].reshape(-1)
+        
+        per_image = []
+        offset = 0
+        for count in counts[:n]:
+            boxes = []
+            for det in dets[offset:offset + int(count)]:
+                class_id, score = int(det[0]), float(det[1])
+                if class_id < 0 or score < self.threshold:
+                    continue
+                boxes.append({
+                    "label": self.labels[class_id] if class_id < len(self.labels) else str(class_id),
+                    "score": score,
+                    "coordinate": [float(v) for v in det[2:6]],
+                })
+            per_image.append(boxes)
+            offset += int(count)
+        return per_image
+
+    def detect(self, images: List[np.ndarray]) -> List[Dict]:
+        tensors, scales = zip(*(self._preprocess(image) for image in images))
+        batch_dim = self.session.get_inputs()[0].shape[0]
+        if isinstance(batch_dim, int) and batch_dim == 1:
+            # 导出时固定了 batch=1，逐张推理
+            per_image = []
+            for tensor, scale in zip(tensors, scales):
+                per_image.extend(self._run(tensor[None], np.array([scale], dtype=np.float32)))
+        else:
+            per_image = self._run(np.stack(tensors), np.array(scales, dtype=np.float32))
+        return [layout_from_boxes(boxes) for boxes in per_image]
+
+    def fingerprint(self) -> str:
+        h = hashlib.sha256(self.name.encode("utf-8"))
+        h.update(_model_fingerprint(self.model_dir).encode("utf-8"))
+        # 重新导出 / 量化的模型大小可能不变，按内容区分
+        h.update(_files_fingerprint([self.onnx_path]).encode("utf-8"))
+        return h.hexdigest()
+
+
+class OpenCVLayoutBackend(LayoutBackend):
+    """
+    纯 OpenCV / NumPy 的轻量检测后端：不需要模型文件，每页数十毫秒
+
+    1. 缩放到 OPENCV_WORK_SIZE 后二值化（灰度阈值 + HSV 饱和度得到的彩色像素）
+    2. 按连通块大小区分字符与图形笔画（线条、色块、位图）
+    3. 对图形笔画做闭运算连成区域，取连通区域的外接框
+    4. 剔除字符墨迹占比高（正文、公式）或图形几乎全是长横竖线（表格）且没有彩色的区域
+
+    只输出 image 框，不区分图注；分数按字符墨迹占比换算，仅用于同一后端内的相对排序
+    """
+
+    name = "opencv"
+    model_input = False
+
+    def __init__(self, work_size: int = OPENCV_WORK_SIZE, min_area: float = OPENCV_MIN_AREA):
+        self.work_size = work_size
+        self.min_area = min_area
+
+    def _detect_one(self, image: np.ndarray) -> Dict:
+        h, w = image.shape[:2]
+        scale = min(1.0, self.work_size / max(h, w))
+        if scale < 1.0:
+            image = cv2.resize(
+                image, (max(1, round(w * scale)), max(1, round(h * scale))), interpolation=cv2.INTER_LINEAR
+            )
+        sh, sw = image.shape[:2]
+        short_side = min(sh, sw)
+        
+        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+        colour = cv2.inRange(cv2.cvtColor(image, cv2.COLOR_BGR2HSV), (0, 60, 60), (180, 255, 255))
+        ink = cv2.bitwise_or(cv2.threshold(gray, 235, 255, cv2.THRESH_BINARY_INV)[1], colour)
+        
+        # 字符大小的连通块之外都是图形笔画
+        text_h = max(3, round(short_side * OPENCV_TEXT_HEIGHT))
+        _, labels, components, _ = cv2.connectedComponentsWithStats(ink, connectivity=8)
+        graphic_lut = ((components[:, 3] > text_h) | (components[:, 2] > 3 * text_h)).astype(np.uint8) * 255
+        graphic_lut[0] = 0
+        graphic = cv2.bitwise_or(np.take(graphic_lut, labels), colour)
+        text = cv2.bitwise_and(ink, cv2.bitwise_not(graphic))
+        
+        k = max(3, round(short_side * OPENCV_CLOSE_SIZE))
+        regions = cv2.morphologyEx(graphic, cv2.MORPH_CLOSE, cv2.getStructuringElement(cv2.MORPH_RECT, (k, k)))
+        _, _, region_stats, _ = cv2.connectedComponentsWithStats(regions, connectivity=8)
+        
+        boxes = []
+        for x, y, bw, bh, _ in region_stats[1:]:
+            if bw * bh < self.min_area * sh * sw or bw < sw * 0.08 or bh < sh * 0.04:
+                continue
+            region = graphic[y:y + bh, x:x + bw]
+            graphic_ink = cv2.countNonZero(region)
+            text_ink = cv2.countNonZero(text[y:y + bh, x:x + bw])
+            text_ratio = text_ink / max(1, graphic_ink + text_ink)
+            colour_ratio = cv2.countNonZero(colour[y:y + bh, x:x + bw]) / (bw * bh)
+            if colour_ratio < OPENCV_MIN_COLOUR_RATIO:
+                if text_ratio > OPENCV_MAX_TEXT_RATIO:
+                    continue
+                # 长度超过区域一半的横线 / 竖线
+                rules = cv2.bitwise_or(
+                    cv2.morphologyEx(region, cv2.MORPH_OPEN, cv2.getStructuringElement(cv2.MORPH_RECT, (max(3, bw // 2), 1))),
+                    cv2.morphologyEx(region, cv2.MORPH_OPEN, cv2.getStructuringElement(cv2.MORPH_RECT, (1, max(3, bh // 2)))),
+                )
+                if text_ink and cv2.countNonZero(rules) > OPENCV_MAX_RULE_RATIO * graphic_ink:
+                    continue
+            boxes.append({
+                "label": "image",
+                "score": round(0.5 + 0.45 * (1 - text_ratio), 4),
+                "coordinate": [x / scale, y / scale, (x + bw) / scale, (y + bh) / scale],
+            })
+        return layout_from_boxes(boxes)
+
+    def detect(self, images: List[np.ndarray]) -> List[Dict]:
+        return [self._detect_one(image) for image in images]
+
+    def fingerprint(self) -> str:
+        return f"{self.name}:{self.work_size}:{self.min_area}"
+
+
+def _load_inference_config(model_dir: Path) -> Dict:
+    """从 inference.yml 读取预处理参数、类别表和阈值"""
+    import yaml
+
+    with open(Path(model_dir) / "inference.yml", "r", encoding="utf-8") as f:
+        config = yaml.safe_load(f)
+    
+    # 默认值与 PP-DocLayoutV2 的 inference.yml 一致
+    result = {
+        "labels": config.get("label_list", []),
+        "target_size": [800, 800],
+        "interpolation": cv2.INTER_CUBIC,
+        "mean": [0.0, 0.0, 0.0],
+        "std": [1.0, 1.0, 1.0],
+        "scale": 1 / 255,
+        "threshold": config.get("draw_threshold", 0.5),
+    }
+    for op in config.get("Preprocess", []):
+        if op.get("type") == "Resize":
+            result["target_size"] = list(op.get("target_size", result["target_size"]))
+            result["interpolation"] = op.get("interp", 2)
+        elif op.get("type") == "NormalizeImage":
+            result["mean"] = op.get("mean", result["mean"])
+            result["std"] = op.get("std", result["std"])
+            if not op.get("is_scale", True):
+                result["scale"] = 1.0
+    return result
+
+
+def quantize_onnx_model(onnx_path: Path) -> Path:
+    """对 ONNX 模型做 int8 动态量化，结果保存为同目录下的 <名称>.int8.onnx（已存在则直接复用）"""
+    onnx_path = Path(onnx_path)
+    quantized_path = onnx_path.with_suffix(".int8.onnx")
+    if not quantized_path.exists():
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+
+        logger.info(f"生成 int8 动态量化模型: {quantized_path.name}")
+        quantize_dynamic(str(onnx_path), str(quantized_path), weight_type=QuantType.QInt8)
+    return quantized_path
+
+
+class LayoutDaemonClient(LayoutBackend):
+    """
+    布局检测守护进程（scripts/layout_daemon.py）的客户端
+
+    页面像素放在共享内存中，通过 Unix socket 只传递共享内存名称与形状，
+    守护进程直接在共享内存上构造数组推理，返回与 _detect_layout 相同结构的结果。
+    """
+
+    name = "daemon"
+
+    def __init__(self, socket_path: str, timeout: float = 120.0, model_dir: Optional[Path] = None):
+        self.socket_path = str(socket_path)
+        self.timeout = timeout
+        self.model_dir = Path(model_dir) if model_dir else None
+
+    def fingerprint(self) -> str:
+        # 假定守护进程加载的是本地同一份模型
+        return _model_fingerprint(self.model_dir) if self.model_dir else self.name
+
+    def detect(self, images: List[np.ndarray]) -> List[Dict]:
+        """检测一批页面图像，返回 [{"images": [...], "captions": [...]}, ...]"""
+        from multiprocessing import shared_memory
+
+        segments = []
+        try:
+            headers = []
+            for image in images:
+                shm = shared_memory.SharedMemory(create=True, size=max(1, image.nbytes))
+                segments.append(shm)
+                np.ndarray(image.shape, dtype=image.dtype, buffer=shm.buf)[...] = image
+                headers.append({"shm": shm.name, "shape": list(image.shape), "dtype": str(image.dtype)})
+            
+            with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+                sock.settimeout(self.timeout)
+                sock.connect(self.socket_path)
+                _send_message(sock, {"images": headers})
+                reply = _recv_message(sock)
+        finally:
+            for shm in segments:
+                shm.close()
+                shm.unlink()
+        
+        if "error" in reply:
+            raise RuntimeError(f"布局检测守护进程返回错误: {reply['error']}")
+        return reply["layouts"]
 
 
 class DocLayoutExtractor:
@@ -36,90 +1152,388 @@ class DocLayoutExtractor:
         output_dir: str = "output/figures",
         model_dir: Optional[str] = None,
         device: str = "cpu",
+        cache_dir: Optional[str] = None,
+        daemon_socket: Optional[str] = None,
+        backend: Union[str, LayoutBackend, None] = None,
+        cpu_threads: Optional[int] = None,
+        enable_mkldnn: Optional[bool] = None,
+        mkldnn_cache_capacity: Optional[int] = None,
+        resize_input: Optional[bool] = None,
+        merge_overlaps: bool = True,
+        image_format: Optional[str] = None,
+        image_quality: Optional[int] = None,
+        encode_workers: int = 2,
+        memory_budget_mb: Optional[float] = None,
+        fallback: Optional[bool] = None,
+        vector_export: Optional[bool] = None,
     ):
+        """
+        Args:
+            output_dir: 图片输出目录
+            model_dir: 模型目录（默认读取 DOC_LAYOUT_MODEL_DIR 环境变量）
+            device: 推理设备
+            cache_dir: 检测结果缓存目录（默认读取 DOC_LAYOUT_CACHE_DIR 环境变量，均未设置时不缓存）
+            daemon_socket: 布局检测守护进程的 Unix socket 路径（默认读取 DOC_LAYOUT_DAEMON_SOCKET
+                           环境变量）；设置后检测请求交给守护进程，本进程不加载模型
+            backend: 检测后端，"paddle"（默认）/ "onnx" / "onnx-int8" / "opencv"（不需要模型的快速模式），
+                     或 LayoutBackend 实例（默认读取 DOC_LAYOUT_BACKEND 环境变量；设置 daemon_socket 时忽略）
+            cpu_threads: 推理线程数（默认 DOC_LAYOUT_CPU_THREADS，否则按 os.sched_getaffinity
+                         可用 CPU 数除以 DOC_LAYOUT_WORKERS 计算）
+            enable_mkldnn: 是否启用 MKLDNN/oneDNN（默认 DOC_LAYOUT_MKLDNN，否则启用）
+            mkldnn_cache_capacity: MKLDNN 输入形状缓存容量（默认 DOC_LAYOUT_MKLDNN_CACHE，否则 10）
+            resize_input: 检测前把页面缩放到 inference.yml 中的模型输入尺寸，框坐标再映射回原图
+                          （默认 DOC_LAYOUT_RESIZE_INPUT，否则启用；读不到输入尺寸时不缩放）
+            merge_overlaps: 裁剪前合并同页互相重叠 / 包含的 image 框（merge_overlapping_boxes）
+            image_format: 输出图片格式 "png" / "webp" / "jpeg"（默认 DOC_LAYOUT_IMAGE_FORMAT，否则 png）
+            image_quality: png 为压缩级别 0-9，webp / jpeg 为质量 0-100
+                           （默认 DOC_LAYOUT_IMAGE_QUALITY，否则取 IMAGE_FORMATS 中的默认值）
+            encode_workers: 后台编码写盘的线程数，0 表示在检测流程中同步写盘
+            memory_budget_mb: 页面渲染工作集的内存预算（不含模型，默认 DOC_LAYOUT_MEMORY_BUDGET_MB）；
+                              设置后按在途页面数折算每页像素上限，超大页面（A3 海报、补充材料）自动降低 DPI，
+                              并在每批之后等待后台写盘完成，及时释放裁剪图副本
+            fallback: 模型文件缺失或推理依赖未安装时自动改用 OpenCV 轻量检测后端
+                      （默认 DOC_LAYOUT_FALLBACK，否则启用）
+            vector_export: 写盘的区域以矢量内容为主时输出裁剪后的 SVG（任意缩放都清晰、体积小），
+                           否则仍按 image_format 输出位图（默认 DOC_LAYOUT_VECTOR_EXPORT，否则启用）
+        """
         self.output_dir = Path(output_dir)
         self.output_dir.mkdir(parents=True, exist_ok=True)
         self.model_dir = Path(
             model_dir or os.getenv("DOC_LAYOUT_MODEL_DIR", DEFAULT_MODEL_DIR)
         )
         self.device = device
-        self._engine = None
+        cache_dir = cache_dir or os.getenv("DOC_LAYOUT_CACHE_DIR")
+        self.cache_dir = Path(cache_dir) if cache_dir else None
+        daemon_socket = daemon_socket or os.getenv("DOC_LAYOUT_DAEMON_SOCKET")
+        if daemon_socket:
+            backend = LayoutDaemonClient(daemon_socket, model_dir=self.model_dir)
+        self.cpu_options = resolve_cpu_options(cpu_threads, enable_mkldnn, mkldnn_cache_capacity)
+        self._backend_spec = backend or os.getenv("DOC_LAYOUT_BACKEND", "paddle")
+        self._backend: Optional[LayoutBackend] = None
+        if resize_input is None:
+            resize_input = _env_bool("DOC_LAYOUT_RESIZE_INPUT") is not False
+        self.resize_input = resize_input
+        self.merge_overlaps = merge_overlaps
+        
+        self.image_format = (image_format or os.getenv("DOC_LAYOUT_IMAGE_FORMAT", "png")).lower()
+        if self.image_format == "jpg":
+            self.image_format = "jpeg"
+        if self.image_format not in IMAGE_FORMATS:
+            raise ValueError(f"不支持的图片格式: {self.image_format}（可选 {', '.join(IMAGE_FORMATS)}）")
+        self.image_ext, quality_flag, default_quality = IMAGE_FORMATS[self.image_format]
+        if image_quality is None:
+            image_quality = _env_int("DOC_LAYOUT_IMAGE_QUALITY")
+        self.image_quality = default_quality if image_quality is None else image_quality
+        self._encode_params = [quality_flag, self.image_quality]
+        self.encode_workers = encode_workers
+        self._encode_pool: Optional[ThreadPoolExecutor] = None
+        self._pending_writes: List[Tuple[Future, Dict]] = []
+        # 并行渲染的进程池与共享内存槽：跨 PDF 复用，close 时关闭
+        self._render_pool: Optional[ProcessPoolExecutor] = None
+        self._render_pool_workers = 0
+        self._render_slots: Optional[_SharedPageSlots] = None
+        self._render_workers_warned = False
+        # 当前 extract_from_pdf 调用的分阶段计时（调用之外为 None，不计时）
+        self._timer: Optional[StageTimer] = None
+        if memory_budget_mb is None and os.getenv("DOC_LAYOUT_MEMORY_BUDGET_MB"):
+            memory_budget_mb = float(os.environ["DOC_LAYOUT_MEMORY_BUDGET_MB"])
+        self.memory_budget_mb = memory_budget_mb
+        self._input_size: Optional[Tuple[int, int]] = None
+        if fallback is None:
+            fallback = _env_bool("DOC_LAYOUT_FALLBACK") is not False
+        self.fallback = fallback
+        if vector_export is None:
+            vector_export = _env_bool("DOC_LAYOUT_VECTOR_EXPORT") is not False
+        if vector_export and not _svg_export_supported():
+            logger.warning(f"PyMuPDF {fitz.VersionBind} 不支持按区域移除矢量路径，矢量图导出已关闭（需要 PyMuPDF>=1.24.2）")
+            vector_export = False
+        self.vector_export = vector_export
+
+    @property
+    def engine(self):
+        """延迟加载 Paddle 布局检测引擎（同一进程内配置相同的提取器共享同一个引擎）"""
+        return get_layout_engine(self.model_dir, self.device, self.cpu_options)
+
+    @property
+    def backend(self) -> LayoutBackend:
+        """延迟创建检测后端"""
+        if self._backend is None:
+            spec = self._backend_spec
+            if self.fallback and isinstance(spec, str) and spec != "opencv":
+                missing = self._missing_backend_requirements(spec)
+                if missing:
+                    logger.warning(f"{spec} 检测后端不可用（{missing}），改用 OpenCV 轻量检测")
+                    spec = "opencv"
+            if isinstance(spec, LayoutBackend):
+                self._backend = spec
+            elif spec == "opencv":
+                self._backend = OpenCVLayoutBackend()
+            elif spec == "paddle":
+                self._backend = PaddleLayoutBackend(self.model_dir, self.device, self.cpu_options)
+            elif spec in ("onnx", "onnx-int8"):
+                self._backend = OnnxLayoutBackend(
+                    self.model_dir,
+                    quantize=spec == "onnx-int8",
+                    intra_op_threads=self.cpu_options["cpu_threads"],
+                )
+            else:
+                raise ValueError(f"未知的检测后端: {spec}")
+        return self._backend
+
+    def _missing_backend_requirements(self, spec: str) -> Optional[str]:
+        """模型后端缺少的文件或依赖（说明文字），齐全时为 None"""
+        if spec == "paddle":
+            missing = [f for f in MODEL_FILES if not (self.model_dir / f).exists()]
+            if missing:
+                return f"模型文件缺失: {missing}"
+            if importlib.util.find_spec("paddleocr") is None:
+                return "未安装 paddleocr"
+        elif spec in ("onnx", "onnx-int8"):
+            missing = [
+                f for f in ("inference.yml", "inference.onnx") if not (self.model_dir / f).exists()
+            ]
+            if missing:
+                return f"模型文件缺失: {missing}"
+            if importlib.util.find_spec("onnxruntime") is None:
+                return "未安装 onnxruntime"
+        return None
+
+    @property
+    def detect_input_size(self) -> Optional[Tuple[int, int]]:
+        """检测前的缩放目标 (高, 宽)；未启用 resize_input、后端不使用模型输入或读不到模型配置时为 None"""
+        if not self.resize_input or not self.backend.model_input:
+            return None
+        if self._input_size is None:
+            try:
+                target_h, target_w = _load_inference_config(self.model_dir)["target_size"]
+                self._input_size = (int(target_h), int(target_w))
+            except Exception as e:
+                logger.debug(f"无法读取模型输入尺寸，检测前不缩放: {e}")
+                self.resize_input = False
+        return self._input_size
+
+    def _detector_fingerprint(self) -> str:
+        """
+        检测结果缓存键中的检测器部分：后端与模型指纹（缩放输入时再加上输入尺寸）的 SHA-256
+
+        后端指纹可能含 ":"、"/" 等字符（如 "opencv:1024:0.01"），统一哈希后才用作目录名
+        """
+        fingerprint = self.backend.fingerprint()
+        if self.detect_input_size:
+            h, w = self.detect_input_size
+            fingerprint = f"{fingerprint}:{h}x{w}"
+        return hashlib.sha256(fingerprint.encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def _file_hash(path: Path) -> str:
+        """文件内容的 SHA-256"""
+        h = hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                h.update(chunk)
+        return h.hexdigest()
+
+    def _layout_cache_path(self, pdf_hash: str, page_idx: int, dpi: int) -> Path:
+        """检测缓存文件路径：<cache_dir>/<检测器指纹>/<PDF 哈希前 2 位>/<PDF 哈希>_<dpi>_p<页>.json"""
+        model_fp = self._detector_fingerprint()
+        return self.cache_dir / model_fp[:16] / pdf_hash[:2] / f"{pdf_hash}_{dpi}_p{page_idx}.json"
 
-    @property
-    def engine(self):
-        """延迟加载布局检测引擎"""
-        if self._engine is None:
-            from paddleocr import LayoutDetection
+    def _load_cached_layout(self, pdf_hash: str, page_idx: int, dpi: int) -> Optional[Dict]:
+        """读取单页检测缓存，不存在或损坏时返回 None"""
+        path = self._layout_cache_path(pdf_hash, page_idx, dpi)
+        if not path.exists():
+            return None
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"读取检测缓存失败 {path.name}: {e}")
+            return None
 
-            # 检查模型文件
-            required_files = ["inference.pdmodel", "inference.pdiparams", "inference.yml"]
-            missing = [f for f in required_files if not (self.model_dir / f).exists()]
-            if missing:
-                raise FileNotFoundError(
-                    f"模型文件缺失: {missing}\n"
-                    f"请下载模型文件到 {self.model_dir}/ 目录，参考 README.md"
-                )
+    def _store_cached_layout(self, pdf_hash: str, page_idx: int, dpi: int, layout: Dict):
+        """写入单页检测缓存（先写临时文件再原子替换，多进程并发安全）"""
+        path = self._layout_cache_path(pdf_hash, page_idx, dpi)
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(layout, f, separators=(",", ":"))
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.warning(f"写入检测缓存失败 {path.name}: {e}")
 
-            logger.info(f"初始化 LayoutDetection (本地 PP-DocLayoutV2)...")
-            self._engine = LayoutDetection(
-                model_name="PP-DocLayoutV2",
-                model_dir=str(self.model_dir),
-                device=self.device,
-            )
-            logger.success("LayoutDetection 初始化完成")
-        return self._engine
+    def _render_page(
+        self,
+        page: "fitz.Page",
+        dpi: int = 300,
+        clip: Optional["fitz.Rect"] = None,
+        buffers: Optional[PageBufferRing] = None,
+    ) -> np.ndarray:
+        """将已打开文档中的页面（或 clip 指定的 PDF 坐标区域）渲染为 BGR 图像"""
+        return _render_page_bgr(page, dpi=dpi, clip=clip, buffers=buffers, timer=self._timer)
 
     def _pdf_page_to_image(self, pdf_path: str, page_num: int, dpi: int = 300) -> np.ndarray:
-        """将 PDF 页面渲染为 BGR 图像（高分辨率）"""
-        doc = fitz.open(pdf_path)
-        page = doc[page_num]
-        zoom = dpi / 72
-        mat = fitz.Matrix(zoom, zoom)
-        pix = page.get_pixmap(matrix=mat)
-        img = np.frombuffer(pix.samples, dtype=np.uint8).reshape(pix.height, pix.width, pix.n)
-        if pix.n == 4:
-            img = cv2.cvtColor(img, cv2.COLOR_RGBA2BGR)
-        elif pix.n == 3:
-            img = cv2.cvtColor(img, cv2.COLOR_RGB2BGR)
-        doc.close()
-        return img
+        """将 PDF 页面渲染为 BGR 图像（高分辨率，单页场景使用）"""
+        with fitz.open(pdf_path) as doc:
+            return self._render_page(doc[page_num], dpi=dpi)
 
-    def _detect_layout(self, image: np.ndarray) -> Dict:
+    def iter_page_images(
+        self,
+        doc: "fitz.Document",
+        page_indices: Iterable[int],
+        dpi: int = 300,
+        buffers: Optional[PageBufferRing] = None,
+        page_dpis: Optional[Dict[int, int]] = None,
+    ) -> Iterator[Tuple[int, np.ndarray]]:
         """
-        检测图像中的布局元素
-        返回: {"images": [...], "captions": [...]}
+        在同一个文档句柄上逐页渲染，按需惰性产出 (页索引, BGR 图像)
+
+        Args:
+            doc: 已打开的 PDF 文档（由调用方负责关闭）
+            page_indices: 要渲染的页索引（从 0 开始）
+            dpi: 渲染分辨率
+            buffers: 提供时各页轮转写入复用的缓冲区而不再逐页分配，
+                     产出的图像只在其槽位被下一次借出前有效
+            page_dpis: 按页覆盖渲染分辨率 {页索引: dpi}
         """
-        result = self.engine.predict(image)
-        
-        images = []
-        captions = []
+        page_dpis = page_dpis or {}
+        for page_idx in page_indices:
+            page_dpi = page_dpis.get(page_idx, dpi)
+            yield page_idx, self._render_page(doc[page_idx], dpi=page_dpi, buffers=buffers)
+
+    def _get_render_pool(self, workers: int) -> ProcessPoolExecutor:
+        """渲染进程池（spawn，不继承主进程已加载的推理引擎），进程数不变时跨 PDF 复用"""
+        if self._render_pool is not None and self._render_pool_workers != workers:
+            self._render_pool.shutdown(wait=True, cancel_futures=True)
+            self._render_pool = None
+        if self._render_pool is None:
+            self._render_pool = ProcessPoolExecutor(
+                max_workers=workers, mp_context=multiprocessing.get_context("spawn")
+            )
+            self._render_pool_workers = workers
+        return self._render_pool
+
+    def _effective_render_workers(self, render_workers: int) -> int:
+        """
+        实际使用的渲染进程数：主进程要做检测，渲染进程数不超过可用 CPU 数 - 1；
+        只有 1 个可用 CPU 时并行渲染只会更慢，退回顺序渲染
+        """
+        if render_workers <= 0:
+            return 0
+        workers = min(render_workers, default_cpu_threads(1) - 1)
+        if workers < render_workers and not self._render_workers_warned:
+            logger.warning(f"可用 CPU 数为 {default_cpu_threads(1)}，渲染进程数由 {render_workers} 降为 {max(0, workers)}")
+            self._render_workers_warned = True
+        return max(0, workers)
+
+    def iter_page_images_parallel(
+        self,
+        pdf_path: str,
+        page_indices: Iterable[int],
+        dpi: int = 300,
+        workers: int = 2,
+        prefetch: Optional[int] = None,
+        page_dpis: Optional[Dict[int, int]] = None,
+        hold: int = 1,
+    ) -> Iterator[Tuple[int, np.ndarray]]:
+        """
+        用进程池提前渲染页面，按页序产出 (页索引, BGR 图像)
+
+        生产者/消费者模式：worker 进程各自打开 PDF，把页面直接渲染进主进程分配的共享内存槽，
+        主进程消费结果做检测。进程池与共享内存槽保存在提取器上跨 PDF 复用，由 close 释放。
+        同时在途（已提交未消费）的页面数不超过 prefetch，内存占用随之受限。
+
+        Args:
+            pdf_path: PDF 文件路径（每个 worker 自行打开）
+            page_indices: 要渲染的页索引（从 0 开始）
+            dpi: 渲染分辨率
+            workers: 渲染进程数
+            prefetch: 在途页面上限，默认 2 * workers
+            page_dpis: 按页覆盖渲染分辨率 {页索引: dpi}
+            hold: 消费方同时持有的页数（如检测批大小）。产出的图像是共享内存槽上的视图，
+                  在其后第 prefetch + hold 页产出前有效，需要长期保留的像素须自行 copy
+        """
+        prefetch = max(1, prefetch or 2 * workers)
+        page_dpis = page_dpis or {}
+        page_iter = iter(page_indices)
+        pending = deque()
+        pool = self._get_render_pool(workers)
+        if self._render_slots is None:
+            self._render_slots = _SharedPageSlots(prefetch + hold)
+        slots = self._render_slots
+        slots.ensure_slots(prefetch + hold)
+        pdf_path = str(pdf_path)
         
-        if result and len(result) > 0:
-            # 获取 JSON 格式结果
-            json_result = result[0].json
-            if isinstance(json_result, str):
-                json_result = json.loads(json_result)
+        with fitz.open(pdf_path) as doc:
+            def submit(page_idx: int):
+                page_dpi = page_dpis.get(page_idx, dpi)
+                width, height = self._region_pixel_size(doc[page_idx], doc[page_idx].rect, page_dpi, padding=0)
+                slot, name = slots.reserve(width * height * 3)
+                future = pool.submit(_render_page_worker, pdf_path, page_idx, page_dpi, name)
+                pending.append((page_idx, page_dpi, slot, future))
             
-            boxes = json_result.get("res", {}).get("boxes", [])
+            for page_idx in itertools.islice(page_iter, prefetch):
+                submit(page_idx)
             
-            for box in boxes:
-                label = box.get("label", "").lower()
-                item = {
-                    "label": label,
-                    "score": box.get("score", 0),
-                    "bbox": box.get("coordinate", []),
-                }
-                
-                # 只提取 image 类型（不包括 figure_title）
-                if label == "image":
-                    images.append(item)
-                elif "title" in label or "caption" in label:
-                    captions.append(item)
+            try:
+                while pending:
+                    page_idx, page_dpi, slot, future = pending.popleft()
+                    shape = future.result()
+                    if shape is None:
+                        image = self._render_page(doc[page_idx], dpi=page_dpi)
+                    else:
+                        image = slots.view(slot, shape)
+                    # 消费一页，补充一页，保持在途数量不超过 prefetch
+                    for next_idx in itertools.islice(page_iter, 1):
+                        submit(next_idx)
+                    yield page_idx, image
+            finally:
+                # 消费方提前结束时，取消尚未开始的渲染任务，并等待已开始的任务写完槽位
+                for *_, future in pending:
+                    future.cancel()
+                for *_, future in pending:
+                    if not future.cancelled():
+                        try:
+                            future.result()
+                        except Exception:
+                            pass
+
+    def _detect_layout(self, image: np.ndarray) -> Dict:
+        """
+        检测图像中的布局元素
+        返回: {"images": [...], "captions": [...]}
+        """
+        return self._detect_layout_batch([image])[0]
+
+    def _detect_layout_batch(self, images: List[np.ndarray]) -> List[Dict]:
+        """
+        批量检测多张页面图像，一次推理调用处理整个批次
+        返回: 与输入顺序一致的 [{"images": [...], "captions": [...]}, ...]，框坐标基于输入图像
         
-        return {"images": images, "captions": captions}
+        启用 resize_input 时先把各页缩放到模型输入尺寸再推理，框坐标映射回原图。
+        启用 fallback 时，本地模型后端（Paddle / ONNX）在推理时才发现文件缺失 / 依赖无法导入，
+        则改用 OpenCV 轻量检测重试；守护进程等其他后端的同类错误（如 socket 不存在）原样抛出
+        """
+        with _timed(self._timer, "detect"):
+            try:
+                return self._run_backend(images)
+            except (FileNotFoundError, ImportError) as e:
+                if not self.fallback or not isinstance(self.backend, (PaddleLayoutBackend, OnnxLayoutBackend)):
+                    raise
+                logger.warning(f"{self.backend.name} 检测后端加载失败（{e}），改用 OpenCV 轻量检测")
+                self._backend = OpenCVLayoutBackend()
+                return self._run_backend(images)
+
+    def _run_backend(self, images: List[np.ndarray]) -> List[Dict]:
+        input_size = self.detect_input_size
+        if input_size is None:
+            return self.backend.detect(images)
+        resized, factors = zip(*(resize_to_model_input(image, input_size) for image in images))
+        layouts = self.backend.detect(list(resized))
+        return [_scale_layout(layout, fx, fy) for layout, (fx, fy) in zip(layouts, factors)]
 
     def _crop_region(self, image: np.ndarray, bbox: list, padding: int = 5) -> np.ndarray:
-        """裁剪图像区域"""
+        """裁剪图像区域（返回原图的视图，原图缓冲区被复用前须写盘或 copy）"""
         h, w = image.shape[:2]
         x0, y0, x1, y1 = [int(v) for v in bbox[:4]]
         x0 = max(0, x0 - padding)
@@ -128,6 +1542,228 @@ class DocLayoutExtractor:
         y1 = min(h, y1 + padding)
         return image[y0:y1, x0:x1]
 
+    def _render_region(
+        self, page: "fitz.Page", rect: "fitz.Rect", dpi: int, padding: int = 5
+    ) -> np.ndarray:
+        """
+        以 dpi 只渲染页面上的一个区域，效果等同于在整页渲染图上 _crop_region
+
+        Args:
+            page: PDF 页面
+            rect: PDF 坐标（point）下的区域
+            dpi: 渲染分辨率
+            padding: 外扩像素数（按 dpi 换算为 point）
+        """
+        pad = padding * 72 / dpi
+        clip = fitz.Rect(rect.x0 - pad, rect.y0 - pad, rect.x1 + pad, rect.y1 + pad) & page.rect
+        return self._render_page(page, dpi=dpi, clip=clip)
+
+    def _region_pixel_size(
+        self, page: "fitz.Page", rect: "fitz.Rect", dpi: int, padding: int = 5
+    ) -> Tuple[int, int]:
+        """不渲染，推算 _render_region 输出图像的 (宽, 高)"""
+        pad = padding * 72 / dpi
+        clip = fitz.Rect(rect.x0 - pad, rect.y0 - pad, rect.x1 + pad, rect.y1 + pad) & page.rect
+        zoom = dpi / 72
+        irect = (clip * fitz.Matrix(zoom, zoom)).irect
+        return irect.width, irect.height
+
+    @staticmethod
+    def _is_vector_region(page: "fitz.Page", rect: "fitz.Rect") -> bool:
+        """
+        根据 page.get_bboxlog() 判断区域是否以矢量内容为主
+
+        位图 / 渐变面积占比不超过 VECTOR_MAX_RASTER_AREA、矢量路径不少于 VECTOR_MIN_PATHS，
+        且没有跨越区域边界的位图（SVG 裁剪时会被整张移除）。旋转页面一律按位图处理
+        """
+        if page.rotation:
+            return False
+        area = rect.width * rect.height
+        if area <= 0:
+            return False
+        raster_area = 0.0
+        paths = 0
+        for kind, bbox in page.get_bboxlog():
+            item = fitz.Rect(bbox)
+            overlap = item & rect
+            if overlap.is_empty:
+                continue
+            if kind in ("fill-image", "fill-imgmask", "fill-shade"):
+                if not rect.contains(item):
+                    return False
+                raster_area += overlap.width * overlap.height
+                if raster_area > VECTOR_MAX_RASTER_AREA * area:
+                    return False
+            elif kind in ("fill-path", "stroke-path"):
+                paths += 1
+        return paths >= VECTOR_MIN_PATHS
+
+    def _export_svg(self, page: "fitz.Page", rect: "fitz.Rect", dpi: int, padding: int = 5) -> str:
+        """
+        将页面区域导出为裁剪后的 SVG（外扩范围与 _render_region 一致）
+
+        先在单页副本上用不填充的涂黑注释移除区域外的文字、路径与位图（否则 SVG 会带上整页内容），
+        再用 show_pdf_page 把区域放到同尺寸的新页面上，通过 get_svg_image 导出
+        """
+        pad = padding * 72 / dpi
+        clip = fitz.Rect(rect.x0 - pad, rect.y0 - pad, rect.x1 + pad, rect.y1 + pad) & page.rect
+        with fitz.open() as src, fitz.open() as out:
+            src.insert_pdf(page.parent, from_page=page.number, to_page=page.number)
+            copy = src[0]
+            bounds = copy.rect
+            for outside in (
+                fitz.Rect(bounds.x0, bounds.y0, bounds.x1, clip.y0),
+                fitz.Rect(bounds.x0, clip.y1, bounds.x1, bounds.y1),
+                fitz.Rect(bounds.x0, clip.y0, clip.x0, clip.y1),
+                fitz.Rect(clip.x1, clip.y0, bounds.x1, clip.y1),
+            ):
+                if not outside.is_empty:
+                    copy.add_redact_annot(outside, fill=False, cross_out=False)
+            # text 参数默认即移除文字（PDF_REDACT_TEXT_REMOVE 常量只在较新版本中导出）
+            copy.apply_redactions(
+                images=fitz.PDF_REDACT_IMAGE_REMOVE,
+                graphics=fitz.PDF_REDACT_LINE_ART_REMOVE_IF_COVERED,
+            )
+            target = out.new_page(width=clip.width, height=clip.height)
+            target.show_pdf_page(target.rect, src, 0, clip=clip)
+            return target.get_svg_image()
+
+    def _write_vector_figure(self, page: "fitz.Page", figure: Dict) -> bool:
+        """
+        区域以矢量内容为主时写出 SVG 并更新 figure 的 path / filename / format；
+        未启用、不满足条件、导出失败或 SVG 过大时返回 False，由调用方按位图写盘
+        """
+        rect = fitz.Rect(figure["rect"])
+        if not self.vector_export or not self._is_vector_region(page, rect):
+            return False
+        try:
+            with _timed(self._timer, "encode"):
+                svg = self._export_svg(page, rect, dpi=figure["dpi"]).encode("utf-8")
+        except (RuntimeError, ValueError, fitz.mupdf.FzErrorBase) as e:
+            # 只兜住 MuPDF 处理个别页面时的错误；接口不匹配（TypeError / AttributeError）应直接暴露
+            logger.warning(f"      SVG 导出失败，改用位图: {figure['filename']} ({e})")
+            return False
+        if len(svg) > VECTOR_MAX_SVG_BYTES:
+            logger.debug(f"      SVG 过大 ({len(svg) / 1024:.0f} KB)，改用位图: {figure['filename']}")
+            return False
+        figure["filename"] = str(Path(figure["filename"]).with_suffix(".svg"))
+        figure["path"] = self.output_dir / figure["filename"]
+        figure["format"] = "svg"
+        with _timed(self._timer, "write"):
+            figure["path"].write_bytes(svg)
+        return True
+
+    def _max_page_pixels(self, batch_size: int, render_workers: int) -> Optional[int]:
+        """按内存预算与在途页面数（检测批次 + 渲染预取）折算的每页像素上限；未设置预算时为 None"""
+        if not self.memory_budget_mb:
+            return None
+        in_flight = max(1, batch_size)
+        if render_workers > 0:
+            in_flight += max(2 * render_workers, batch_size)
+        budget = self.memory_budget_mb * 1024 * 1024
+        return int(budget / (PAGE_BYTES_PER_PIXEL * (in_flight + PAGE_TRANSIENT_BUFFERS)))
+
+    @staticmethod
+    def _page_dpi(page: "fitz.Page", dpi: int, max_page_pixels: Optional[int]) -> int:
+        """该页在 max_page_pixels 像素上限内可用的渲染 DPI（不超过 dpi）"""
+        if not max_page_pixels:
+            return dpi
+        area = page.rect.width * page.rect.height
+        if area * (dpi / 72) ** 2 <= max_page_pixels:
+            return dpi
+        return max(1, int(72 * (max_page_pixels / area) ** 0.5))
+
+    def _encode_and_write(self, path: Path, image: np.ndarray, timer: Optional[StageTimer] = None):
+        """按配置的格式编码并写盘"""
+        with _timed(timer, "encode"):
+            ok, encoded = cv2.imencode(self.image_ext, image, self._encode_params)
+        if not ok:
+            raise RuntimeError(f"图片编码失败: {path.name}")
+        with _timed(timer, "write"):
+            encoded.tofile(str(path))
+
+    def _write_figure(self, figure: Dict, image: np.ndarray, copy: bool = False):
+        """
+        将裁剪图写到 figure["path"]
+
+        encode_workers > 0 时提交到后台线程，调用方继续处理后续页面，由 _wait_for_writes 收尾；
+        copy 为 True 表示 image 是复用缓冲区上的视图，提交前需复制
+        """
+        if self.encode_workers <= 0:
+            self._encode_and_write(figure["path"], image, self._timer)
+            return
+        if self._encode_pool is None:
+            self._encode_pool = ThreadPoolExecutor(
+                max_workers=self.encode_workers, thread_name_prefix="figure-encode"
+            )
+        if copy:
+            with _timed(self._timer, "crop"):
+                image = image.copy()
+        future = self._encode_pool.submit(self._encode_and_write, figure["path"], image, self._timer)
+        self._pending_writes.append((future, figure))
+
+    def _wait_for_writes(self):
+        """等待后台写盘全部完成；写盘失败的候选 path 置为 None"""
+        pending, self._pending_writes = self._pending_writes, []
+        for future, figure in pending:
+            try:
+                future.result()
+            except Exception as e:
+                logger.warning(f"写入图片失败 {figure['filename']}: {e}")
+                figure["path"] = None
+
+    def close(self):
+        """
+        等待后台写盘完成并关闭编码线程池、渲染进程池，释放渲染用的共享内存
+
+        关闭后提取器仍可继续使用（线程池 / 进程池按需重新创建）；也可用 with 语句在退出时自动关闭
+        """
+        self._wait_for_writes()
+        if self._encode_pool is not None:
+            self._encode_pool.shutdown(wait=True)
+            self._encode_pool = None
+        if self._render_pool is not None:
+            self._render_pool.shutdown(wait=True, cancel_futures=True)
+            self._render_pool = None
+        if self._render_slots is not None:
+            self._render_slots.close()
+            self._render_slots = None
+
+    def __enter__(self) -> "DocLayoutExtractor":
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def _persist_figure(self, page: "fitz.Page", figure: Dict) -> Path:
+        """按候选记录导出 SVG，或重新渲染区域并写盘（可能在后台完成），更新并返回 figure["path"]"""
+        if self._write_vector_figure(page, figure):
+            logger.debug(f"      保存: {figure['filename']} (score={figure['total_score']:.1f})")
+            return figure["path"]
+        cropped = self._render_region(page, fitz.Rect(figure["rect"]), dpi=figure["dpi"])
+        figure["path"] = self.output_dir / figure["filename"]
+        self._write_figure(figure, cropped)
+        logger.debug(f"      保存: {figure['filename']} (score={figure['total_score']:.1f})")
+        return figure["path"]
+
+    def materialize_figure(self, pdf_path: str, figure: Dict) -> Path:
+        """
+        将 extract_from_pdf 返回的任一候选按需写盘
+
+        Args:
+            pdf_path: 候选所属的 PDF 文件路径
+            figure: extract_from_pdf 返回的 figures 中的一项
+
+        Returns:
+            图片文件路径（已写盘的候选直接返回原路径）
+        """
+        if figure.get("path") is not None:
+            return figure["path"]
+        with fitz.open(str(pdf_path)) as doc:
+            self._persist_figure(doc[figure["page"] - 1], figure)
+        self._wait_for_writes()
+        return figure["path"]
+
     def _score_figure(self, page: int, area: int, width: int, height: int, det_score: float) -> float:
         """
         智能评分：选择最可能是网络架构图的图片
@@ -140,14 +1776,7 @@ class DocLayoutExtractor:
         aspect_ratio = width / height if height > 0 else 1
         
         # 位置分：第2-3页最高
-        if page == 2 or page == 3:
-            position_score = 50
-        elif page == 1:
-            position_score = 30
-        elif page <= 5:
-            position_score = 20
-        else:
-            position_score = 10
+        position_score = self._position_score(page)
         
         # 面积分：大图优先
         area_score = min(area / 50000, 60)
@@ -170,8 +1799,451 @@ class DocLayoutExtractor:
         
         return position_score + area_score + ratio_score + conf_score + size_penalty
 
+    @staticmethod
+    def _position_score(page: int) -> float:
+        """位置分（page 从 1 开始）：第2-3页最高"""
+        if page == 2 or page == 3:
+            return 50
+        elif page == 1:
+            return 30
+        elif page <= 5:
+            return 20
+        return 10
+
+    def _score_upper_bound(self, page: int, captioned: bool = False) -> float:
+        """
+        该页任意图片可能取得的最高分（面积 60 + 宽高比 30 + 置信度 20）
+
+        captioned 为 True 表示该页有架构类图注，候选可能再获得 CAPTION_BOOST
+        """
+        bound = self._position_score(page) + 60 + 30 + 20
+        return bound + CAPTION_BOOST if captioned else bound
+
+    def _page_scan_order(self, total_pages: int) -> List[int]:
+        """按先验可能性排序的页索引（第 2、3、1、4、5… 页），同分按页序"""
+        return sorted(range(total_pages), key=lambda idx: (-self._position_score(idx + 1), idx))
+
+    def _figure_captions(self, page: "fitz.Page") -> List[Dict]:
+        """
+        从文本层找出以 "Figure N:" / "Fig. N." 开头的图注（不依赖检测模型）
+
+        返回: [{"number": int, "text": str, "rect": (x0, y0, x1, y1), "architecture": bool}, ...]，
+        坐标为 PDF point；architecture 表示图注含 overview / pipeline / framework 等关键词
+        """
+        blocks: Dict[int, List] = {}
+        for x0, y0, x1, y1, word, block_no, _, _ in page.get_text("words"):
+            blocks.setdefault(block_no, []).append((x0, y0, x1, y1, word))
+        
+        captions = []
+        for words in blocks.values():
+            text = " ".join(w[4] for w in words)
+            match = CAPTION_PATTERN.match(text)
+            if not match:
+                continue
+            captions.append({
+                "number": int(match.group(1)),
+                "text": text,
+                "rect": (
+                    min(w[0] for w in words), min(w[1] for w in words),
+                    max(w[2] for w in words), max(w[3] for w in words),
+                ),
+                "architecture": bool(CAPTION_KEYWORD_PATTERN.search(text)),
+            })
+        return captions
+
+    @staticmethod
+    def _caption_below(rect: "fitz.Rect", captions: List[Dict]) -> Optional[Dict]:
+        """返回紧贴在 rect 正下方（水平方向有重叠）的第一个架构类图注"""
+        for caption in captions:
+            if not caption["architecture"]:
+                continue
+            x0, y0, x1, _ = caption["rect"]
+            gap = y0 - rect.y1
+            if -CAPTION_MAX_GAP / 2 <= gap <= CAPTION_MAX_GAP and min(x1, rect.x1) > max(x0, rect.x0):
+                return caption
+        return None
+
+    def _may_contain_figure(self, page: "fitz.Page") -> bool:
+        """
+        廉价的图形预过滤：根据 page.get_bboxlog() 的绘制记录判断该页是否可能有图片
+
+        满足任一条件即保留：有面积不可忽略的位图 / 渐变；非细线矢量路径不少于 PREFILTER_MIN_PATHS；
+        文字覆盖率低于 PREFILTER_MIN_TEXT_COVERAGE（大片空白可能是无法从绘制记录识别的图形）。
+        只有正文、公式与表格线的页面返回 False
+        """
+        page_rect = page.rect
+        page_area = page_rect.width * page_rect.height
+        paths = 0
+        text_area = 0.0
+        for kind, bbox in page.get_bboxlog():
+            rect = fitz.Rect(bbox) & page_rect
+            if rect.is_empty:
+                continue
+            if kind in ("fill-image", "fill-imgmask", "fill-shade"):
+                if rect.width * rect.height >= PREFILTER_MIN_IMAGE_AREA * page_area:
+                    return True
+            elif kind in ("fill-path", "stroke-path"):
+                # 公式分数线、表格线、下划线等细线不计
+                if rect.width >= 1.5 and rect.height >= 1.5:
+                    paths += 1
+                    if paths >= PREFILTER_MIN_PATHS:
+                        return True
+            elif kind in ("fill-text", "stroke-text"):
+                text_area += rect.width * rect.height
+        return text_area < PREFILTER_MIN_TEXT_COVERAGE * page_area
+
+    def _native_figure_boxes(self, page: "fitz.Page") -> List[Dict]:
+        """
+        基于 PDF 原生信息定位候选图片（不依赖检测模型）
+
+        - 嵌入位图：page.get_image_info() 给出的显示区域
+        - 矢量图：page.get_drawings() 的绘图按间距聚类成块，
+          过滤只由水平/垂直细线组成的块（通常是表格线）
+
+        返回: 与 _detect_layout 相同结构的 box 列表，坐标为 PDF point（即 72 DPI）
+        """
+        page_rect = page.rect
+        page_area = page_rect.width * page_rect.height
+        boxes = []
+        
+        for info in page.get_image_info():
+            rect = fitz.Rect(info["bbox"]) & page_rect
+            # 跳过图标 / 徽标，以及整页扫描图
+            area = rect.width * rect.height
+            if rect.is_empty or area < NATIVE_MIN_AREA * page_area or area > 0.9 * page_area:
+                continue
+            boxes.append({
+                "label": "image",
+                "score": NATIVE_RASTER_CONFIDENCE,
+                "bbox": [rect.x0, rect.y0, rect.x1, rect.y1],
+                "source": "raster",
+            })
+        
+        drawings = page.get_drawings()
+        if len(drawings) > NATIVE_MAX_DRAWINGS:
+            return boxes
+        
+        for rect, members in _cluster_rects([d["rect"] for d in drawings], NATIVE_CLUSTER_GAP):
+            if len(members) < NATIVE_MIN_DRAWINGS:
+                continue
+            # 表格线：几乎全部是细线
+            thin = sum(1 for r in members if r.width < 1.5 or r.height < 1.5)
+            if thin >= 0.9 * len(members):
+                continue
+            rect = rect & page_rect
+            if rect.is_empty or rect.width * rect.height < NATIVE_MIN_AREA * page_area:
+                continue
+            boxes.append({
+                "label": "image",
+                "score": NATIVE_VECTOR_CONFIDENCE,
+                "bbox": [rect.x0, rect.y0, rect.x1, rect.y1],
+                "source": "vector",
+            })
+        
+        return boxes
+
+    def _merge_page_boxes(self, boxes: List[Dict], stats: Optional[Dict]) -> List[Dict]:
+        """按 merge_overlaps 设置合并单页重叠框，被合并的框数累加到 stats["suppressed_boxes"]"""
+        if not self.merge_overlaps:
+            return boxes
+        boxes, suppressed = merge_overlapping_boxes(boxes)
+        if suppressed:
+            logger.debug(f"      合并重叠框 {suppressed} 个")
+            if stats is not None:
+                stats["suppressed_boxes"] += suppressed
+        return boxes
+
+    def _collect_page_figures(
+        self,
+        page: "fitz.Page",
+        page_idx: int,
+        boxes: List[Dict],
+        pdf_name: str,
+        page_image: Optional[np.ndarray],
+        detect_dpi: int,
+        dpi: int,
+        persist: bool = True,
+        captions: Optional[List[Dict]] = None,
+        score_dpi: Optional[int] = None,
+    ) -> List[Dict]:
+        """
+        对单页检测到的 image 框进行裁剪、评分和保存
+
+        Args:
+            page: PDF 页面
+            page_idx: 页索引（从 0 开始）
+            boxes: 检测框（坐标基于 detect_dpi 渲染图）
+            pdf_name: 用于生成文件名的 PDF 名称
+            page_image: 按 dpi 渲染的整页图；为 None 时按区域重新渲染裁剪
+            detect_dpi: 检测框所在渲染图的分辨率
+            dpi: 输出裁剪图的分辨率
+            persist: 为 False 时只记录候选（bbox / 页码 / 分数），不编码写盘，path 为 None
+            captions: 该页的图注（_figure_captions），框正下方紧跟架构类图注时加 CAPTION_BOOST 分
+            score_dpi: 评分时按该分辨率折算区域像素尺寸（默认即 dpi）；内存预算降低了本页 dpi 时传入
+                       名义 dpi，使评分与选图结果不受预算影响
+        """
+        figures = []
+        to_pdf = 72 / detect_dpi
+        to_output = dpi / detect_dpi
+        
+        for img_idx, img_box in enumerate(boxes):
+            det_bbox = img_box["bbox"]
+            if len(det_bbox) < 4:
+                continue
+            
+            # 检测坐标 -> PDF 坐标 -> 输出分辨率像素坐标
+            rect = fitz.Rect(*[v * to_pdf for v in det_bbox[:4]])
+            bbox = [v * to_output for v in det_bbox[:4]]
+            
+            cropped = None
+            if page_image is not None:
+                # 直接裁剪高 DPI 渲染的页面图像
+                with _timed(self._timer, "crop"):
+                    cropped = self._crop_region(page_image, bbox)
+                h, w = cropped.shape[:2]
+            elif persist and not (self.vector_export and self._is_vector_region(page, rect)):
+                # 只对该区域做高 DPI 渲染（矢量区域导出 SVG，不需要渲染）
+                cropped = self._render_region(page, rect, dpi=dpi)
+                h, w = cropped.shape[:2]
+            else:
+                # 候选模式：不渲染，直接由裁剪区域推算尺寸
+                w, h = self._region_pixel_size(page, rect, dpi=dpi)
+            area = w * h
+            
+            # 评分
+            with _timed(self._timer, "score"):
+                score_w, score_h = w, h
+                if score_dpi and score_dpi != dpi:
+                    score_w, score_h = self._region_pixel_size(page, rect, dpi=score_dpi)
+                score = self._score_figure(
+                    page=page_idx + 1,
+                    area=score_w * score_h,
+                    width=score_w,
+                    height=score_h,
+                    det_score=img_box["score"]
+                )
+                caption = self._caption_below(rect, captions) if captions else None
+                if caption is not None:
+                    score += CAPTION_BOOST
+            
+            filename = f"{pdf_name}_p{page_idx+1}_img{img_idx+1}{self.image_ext}"
+            figure = {
+                "path": self.output_dir / filename if persist else None,
+                "filename": filename,
+                "page": page_idx + 1,
+                "bbox": bbox,
+                "rect": tuple(rect),
+                "dpi": dpi,
+                "size": (w, h),
+                "area": area,
+                "detection_score": img_box["score"],
+                "total_score": score,
+                "source": img_box.get("source", "detector"),
+                "caption": caption["text"] if caption is not None else None,
+                "format": self.image_format,
+            }
+            figures.append(figure)
+            
+            # 保存：矢量区域优先导出 SVG；位图裁剪自整页图时是页面缓冲区上的视图，后台写盘前需复制
+            if persist:
+                if not self._write_vector_figure(page, figure):
+                    if cropped is None:
+                        cropped = self._render_region(page, rect, dpi=dpi)
+                    self._write_figure(figure, cropped, copy=page_image is not None)
+                logger.debug(f"      保存: {figure['filename']} ({w}x{h}, score={score:.1f})")
+            else:
+                logger.debug(f"      候选: {filename} ({w}x{h}, score={score:.1f})")
+        
+        return figures
+
+    def _collect_native_figures(
+        self,
+        doc: "fitz.Document",
+        total_pages: int,
+        pdf_name: str,
+        dpi: int,
+        captions: Optional[Dict[int, List[Dict]]] = None,
+        stats: Optional[Dict] = None,
+        max_page_pixels: Optional[int] = None,
+    ) -> List[Dict]:
+        """用 PDF 原生信息收集前 total_pages 页的候选（只评分，不写盘）"""
+        figures = []
+        for page_idx in range(total_pages):
+            page = doc[page_idx]
+            boxes = self._merge_page_boxes(self._native_figure_boxes(page), stats)
+            figures.extend(self._collect_page_figures(
+                page, page_idx, boxes, pdf_name,
+                page_image=None, detect_dpi=72,
+                dpi=self._page_dpi(page, dpi, max_page_pixels), persist=False,
+                captions=captions.get(page_idx) if captions else None,
+                score_dpi=dpi,
+            ))
+        return figures
+
+    def _iter_page_layouts(
+        self,
+        doc: "fitz.Document",
+        pdf_path: Path,
+        page_indices: List[int],
+        render_dpi: int,
+        batch_size: int,
+        render_workers: int,
+        stats: Dict,
+        max_page_pixels: Optional[int] = None,
+    ) -> Iterator[List[Tuple[int, Optional[np.ndarray], Dict]]]:
+        """
+        按批次产出 [(页索引, 页面图像或 None, 布局结果), ...]
+
+        先产出检测缓存命中的页面（不渲染、不推理，图像为 None），
+        再按 page_indices 顺序渲染并检测其余页面，检测结果写回缓存。
+        超出 max_page_pixels 的页面以较低 DPI 渲染，框坐标换算回 render_dpi，图像为 None；
+        实际渲染的页面分配记入 stats["page_memory"]
+        """
+        pdf_hash = self._file_hash(pdf_path) if self.cache_dir else None
+        page_dpis = {idx: self._page_dpi(doc[idx], render_dpi, max_page_pixels) for idx in page_indices}
+        
+        def to_render_dpi(page_idx: int, layout: Dict) -> Dict:
+            factor = render_dpi / page_dpis[page_idx]
+            return _scale_layout(layout, factor, factor)
+        
+        cached = []
+        misses = []
+        for page_idx in page_indices:
+            layout = (
+                self._load_cached_layout(pdf_hash, page_idx, page_dpis[page_idx]) if pdf_hash else None
+            )
+            if layout is not None:
+                cached.append((page_idx, None, to_render_dpi(page_idx, layout)))
+            else:
+                misses.append(page_idx)
+        stats["cache_hits"] += len(cached)
+        if cached:
+            logger.debug(f"   检测缓存命中 {len(cached)} 页")
+            yield cached
+        
+        if not misses:
+            return
+        if render_workers > 0:
+            pages = self.iter_page_images_parallel(
+                str(pdf_path), misses, dpi=render_dpi,
+                workers=render_workers, prefetch=max(2 * render_workers, batch_size),
+                page_dpis=page_dpis, hold=batch_size,
+            )
+        else:
+            # 一个批次的页面同时驻留，消费方处理完整批后才会渲染下一批，batch_size 个槽位即可复用
+            pages = self.iter_page_images(
+                doc, misses, dpi=render_dpi, buffers=PageBufferRing(batch_size), page_dpis=page_dpis
+            )
+        
+        try:
+            for batch in _batched(pages, batch_size):
+                for page_idx, page_image in batch:
+                    stats["page_memory"].append({
+                        "page": page_idx + 1, "dpi": page_dpis[page_idx], "bytes": page_image.nbytes,
+                    })
+                layouts = self._detect_layout_batch([page_image for _, page_image in batch])
+                if pdf_hash:
+                    for (page_idx, _), layout in zip(batch, layouts):
+                        self._store_cached_layout(pdf_hash, page_idx, page_dpis[page_idx], layout)
+                yield [
+                    (
+                        page_idx,
+                        page_image if page_dpis[page_idx] == render_dpi else None,
+                        to_render_dpi(page_idx, layout),
+                    )
+                    for (page_idx, page_image), layout in zip(batch, layouts)
+                ]
+                del batch, layouts
+        finally:
+            # 消费方提前结束时关闭渲染生成器（并行模式下会取消未开始的渲染任务）
+            pages.close()
+
+    def _collect_detected_figures(
+        self,
+        doc: "fitz.Document",
+        pdf_path: Path,
+        total_pages: int,
+        pdf_name: str,
+        dpi: int,
+        render_dpi: int,
+        batch_size: int,
+        render_workers: int,
+        persist: bool,
+        early_exit: bool,
+        stats: Dict,
+        page_subset: Optional[List[int]] = None,
+        captions: Optional[Dict[int, List[Dict]]] = None,
+        max_page_pixels: Optional[int] = None,
+    ) -> List[Dict]:
+        """
+        渲染页面并用布局检测模型收集候选
+
+        early_exit 时按先验顺序扫描，一旦当前最高分超过所有未扫描页面的分数上界即停止；
+        扫描 / 跳过的页数累加到 stats。page_subset 给出时只处理其中的页；
+        captions 为 {页索引: 图注列表}，用于候选加分以及提前结束时的分数上界；
+        max_page_pixels 给出时检测与裁剪都按页限制像素数，并在每批之后等待后台写盘完成
+        """
+        figures = []
+        captions = captions or {}
+        page_indices = self._page_scan_order(total_pages) if early_exit else list(range(total_pages))
+        if page_subset is not None:
+            subset = set(page_subset)
+            page_indices = [idx for idx in page_indices if idx in subset]
+        remaining = set(page_indices)
+        
+        batches = self._iter_page_layouts(
+            doc, pdf_path, page_indices, render_dpi, batch_size, render_workers, stats,
+            max_page_pixels=max_page_pixels,
+        )
+        for batch in batches:
+            for page_idx, page_image, layout in batch:
+                logger.debug(f"   处理第 {page_idx + 1}/{total_pages} 页...")
+                images = layout["images"]
+                logger.debug(f"      检测到 {len(images)} 个 image")
+                images = self._merge_page_boxes(images, stats)
+                
+                page = doc[page_idx]
+                page_dpi = self._page_dpi(page, dpi, max_page_pixels)
+                figures.extend(self._collect_page_figures(
+                    page, page_idx, images, pdf_name,
+                    page_image=page_image if render_dpi == page_dpi else None,
+                    detect_dpi=render_dpi, dpi=page_dpi,
+                    persist=persist,
+                    captions=captions.get(page_idx),
+                    score_dpi=dpi,
+                ))
+                remaining.discard(page_idx)
+            del batch
+            if max_page_pixels:
+                self._wait_for_writes()
+            
+            if early_exit and figures and remaining:
+                best_score = max(f["total_score"] for f in figures)
+                remaining_bound = max(
+                    self._score_upper_bound(
+                        idx + 1, captioned=any(c["architecture"] for c in captions.get(idx, []))
+                    )
+                    for idx in remaining
+                )
+                if best_score > remaining_bound:
+                    logger.debug(
+                        f"   提前结束: 最高分 {best_score:.1f} > 剩余页上界 {remaining_bound:.1f}，"
+                        f"跳过 {len(remaining)} 页"
+                    )
+                    break
+        batches.close()
+        
+        stats["pages_scanned"] += len(page_indices) - len(remaining)
+        stats["pages_skipped_early_exit"] += len(remaining)
+        return figures
+
     def extract_from_pdf(
-        self, pdf_path: str, max_pages: int = 8, dpi: int = 300
+        self, pdf_path: str, max_pages: int = 8, dpi: int = 300,
+        detect_dpi: Optional[int] = None, batch_size: int = 1,
+        render_workers: int = 0, persist_top_k: Optional[int] = None,
+        native_first: bool = False, early_exit: bool = False,
+        caption_first: bool = False, prefilter: bool = True,
+        output_name: Optional[str] = None,
     ) -> Dict:
         """
         从 PDF 提取图片，并智能选择网络架构图
@@ -179,74 +2251,147 @@ class DocLayoutExtractor:
         Args:
             pdf_path: PDF 文件路径
             max_pages: 最多处理的页数
-            dpi: 渲染分辨率
+            dpi: 渲染分辨率（裁剪输出的分辨率）
+            detect_dpi: 布局检测用的渲染分辨率。低于 dpi 时启用双分辨率模式：
+                        以低 DPI 整页渲染做检测，只把选中的区域按 dpi 重新渲染裁剪
+            batch_size: 每次送入检测引擎的页数（同时驻留内存的页面数也随之增加）
+            render_workers: >0 时用该数量的进程提前渲染页面，渲染与检测并行；
+                            在途页面数限制为 max(2 * render_workers, batch_size)。
+                            进程数不超过可用 CPU 数 - 1（只有 1 个 CPU 时退回顺序渲染）
+            persist_top_k: 为 None 时每个检测到的图片都写盘；否则只记录候选，
+                           评分排序后仅写出前 k 个，其余候选可用 materialize_figure 按需写盘
+            native_first: 先用 PDF 原生信息（嵌入位图 / 矢量绘图簇）找候选并评分，
+                          最高分达到 NATIVE_MIN_SCORE 时直接采用，不加载、不运行检测模型
+            early_exit: 按第 2、3、1、4… 页的顺序扫描，当前最高分已超过所有未扫描页
+                        可能取得的最高分时停止（主图不变，其余候选可能变少）
+            caption_first: 先扫描文本层中的 "Figure N: Overview / Pipeline / Framework…" 架构类图注，
+                           只对有这类图注的页做布局检测（都没有或未检出图片时回退到其余页），
+                           并给正下方紧跟此类图注的候选加 CAPTION_BOOST 分
+            prefilter: 检测前按绘制记录（矢量路径数、位图数、文字覆盖率）跳过不可能有图片的页面，
+                       不渲染也不推理；设为 False 可关闭以便核对
+            output_name: 图片文件名前缀（{output_name}_p{页}_img{序号}），默认为 PDF 文件名（不含扩展名）；
+                         多个同名 PDF 写入同一 output_dir 时需传入互不相同的前缀
             
         Returns:
             {
-                "figures": [...],
+                "figures": [...],  # 按分数降序；未写盘的候选 path 为 None
                 "main_figure": Path,  # 最可能的架构图
                 "secondary_figure": Path,  # 次选
-                "total_figures": int
+                "total_figures": int,
+                "stats": {
+                    "pages_scanned": int,  # 经检测模型处理的页数（含缓存命中）
+                    "pages_skipped_early_exit": int,
+                    "cache_hits": int,  # 直接使用检测缓存、未渲染未推理的页数
+                    "caption_pages": int,  # caption_first 时含架构类图注的页数
+                    "pages_skipped_caption": int,  # caption_first 时因无图注而未检测的页数
+                    "pages_skipped_prefilter": int,  # 预过滤判定为无图而未检测的页数
+                    "suppressed_boxes": int,  # 合并重叠框时被并入其他框的框数
+                    "max_page_pixels": int | None,  # 内存预算折算的每页像素上限
+                    "page_memory": [{"page", "dpi", "bytes"}, ...],  # 每个渲染页面的缓冲区大小
+                    "rss_start_mb": float | None,  # 开始提取时的常驻内存
+                    "peak_rss_mb": float | None,  # 常驻内存峰值（含模型）；设置内存预算时从本次提取开始统计，否则为进程内峰值
+                    "timings": {阶段: {"seconds", "calls"}},  # PIPELINE_STAGES 各阶段累计耗时；
+                                                             # render_workers > 0 时子进程内的渲染不计入
+                },
             }
         """
         pdf_path = Path(pdf_path)
-        pdf_name = pdf_path.stem
+        pdf_name = output_name or pdf_path.stem
+        render_workers = self._effective_render_workers(render_workers)
         
-        doc = fitz.open(str(pdf_path))
-        total_pages = min(len(doc), max_pages)
-        doc.close()
+        # 双分辨率：检测在 detect_dpi 上做，裁剪按 dpi 重新渲染
+        render_dpi = detect_dpi if detect_dpi and detect_dpi < dpi else dpi
         
         all_figures = []
+        stats = {
+            "pages_scanned": 0,
+            "pages_skipped_early_exit": 0,
+            "cache_hits": 0,
+            "caption_pages": 0,
+            "pages_skipped_caption": 0,
+            "pages_skipped_prefilter": 0,
+            "suppressed_boxes": 0,
+            "max_page_pixels": self._max_page_pixels(batch_size, render_workers),
+            "page_memory": [],
+            "rss_start_mb": current_rss_mb(),
+            "peak_rss_mb": None,
+        }
+        # 设置了内存预算时峰值从本次提取开始统计；否则不重置，以免影响进程内其他峰值统计
+        if self.memory_budget_mb:
+            reset_peak_rss()
+        max_page_pixels = stats["max_page_pixels"]
+        timer = self._timer = StageTimer()
         
-        logger.info(f"开始提取 PDF 图片: {pdf_path.name} ({total_pages} 页)")
-        
-        for page_idx in range(total_pages):
-            logger.debug(f"   处理第 {page_idx + 1}/{total_pages} 页...")
-            
-            page_image = self._pdf_page_to_image(str(pdf_path), page_idx, dpi=dpi)
-            layout = self._detect_layout(page_image)
-            
-            images = layout["images"]
-            logger.debug(f"      检测到 {len(images)} 个 image")
+        # 整个提取过程只打开一次 PDF
+        with _timed(timer, "open"):
+            doc = fitz.open(str(pdf_path))
+        with doc:
+            total_pages = min(len(doc), max_pages)
+
+            captions = None
+            caption_pages = []
+            if caption_first:
+                captions = {idx: self._figure_captions(doc[idx]) for idx in range(total_pages)}
+                caption_pages = [
+                    idx for idx, page_captions in captions.items()
+                    if any(c["architecture"] for c in page_captions)
+                ]
+                stats["caption_pages"] = len(caption_pages)
+                logger.debug(f"   架构类图注所在页: {[idx + 1 for idx in caption_pages]}")
+
+            if native_first:
+                all_figures = self._collect_native_figures(
+                    doc, total_pages, pdf_name, dpi, captions, stats, max_page_pixels
+                )
+                best_score = max((f["total_score"] for f in all_figures), default=0)
+                if best_score >= NATIVE_MIN_SCORE:
+                    logger.info(f"原生快速路径命中: {pdf_path.name} (最高分 {best_score:.1f})，跳过布局检测")
+                else:
+                    logger.debug(f"原生候选不可信 (最高分 {best_score:.1f})，回退到 PP-DocLayoutV2")
+                    all_figures = []
+                    stats["suppressed_boxes"] = 0
             
-            for img_idx, img_box in enumerate(images):
-                bbox = img_box["bbox"]
-                if len(bbox) < 4:
-                    continue
-                
-                # 直接裁剪高 DPI 渲染的页面图像
-                cropped = self._crop_region(page_image, bbox)
-                h, w = cropped.shape[:2]
-                area = w * h
+            if not all_figures:
+                logger.info(f"开始提取 PDF 图片: {pdf_path.name} ({total_pages} 页, 检测 DPI {render_dpi})")
+                detect_pages = list(range(total_pages))
+                if prefilter:
+                    detect_pages = [idx for idx in detect_pages if self._may_contain_figure(doc[idx])]
+                    stats["pages_skipped_prefilter"] = total_pages - len(detect_pages)
+                    logger.debug(f"   预过滤跳过 {stats['pages_skipped_prefilter']} 页")
                 
-                # 评分
-                score = self._score_figure(
-                    page=page_idx + 1,
-                    area=area,
-                    width=w,
-                    height=h,
-                    det_score=img_box["score"]
+                detect_kwargs = dict(
+                    persist=persist_top_k is None, early_exit=early_exit,
+                    stats=stats, captions=captions, max_page_pixels=max_page_pixels,
                 )
-                
-                # 保存
-                filename = f"{pdf_name}_p{page_idx+1}_img{img_idx+1}.png"
-                save_path = self.output_dir / filename
-                cv2.imwrite(str(save_path), cropped)
-                
-                all_figures.append({
-                    "path": save_path,
-                    "page": page_idx + 1,
-                    "bbox": bbox,
-                    "size": (w, h),
-                    "area": area,
-                    "detection_score": img_box["score"],
-                    "total_score": score,
-                })
-                
-                logger.debug(f"      保存: {filename} ({w}x{h}, score={score:.1f})")
-        
-        # 按分数排序选择
-        all_figures.sort(key=lambda x: x["total_score"], reverse=True)
+                caption_set = set(caption_pages)
+                captioned = [idx for idx in detect_pages if idx in caption_set]
+                all_figures = self._collect_detected_figures(
+                    doc, pdf_path, total_pages, pdf_name, dpi, render_dpi,
+                    batch_size, render_workers,
+                    page_subset=captioned or detect_pages, **detect_kwargs,
+                )
+                if captioned:
+                    rest = [idx for idx in detect_pages if idx not in caption_set]
+                    if all_figures or not rest:
+                        stats["pages_skipped_caption"] = len(rest)
+                    else:
+                        logger.debug("图注所在页未检出图片，回退到其余页面")
+                        all_figures = self._collect_detected_figures(
+                            doc, pdf_path, total_pages, pdf_name, dpi, render_dpi,
+                            batch_size, render_workers, page_subset=rest, **detect_kwargs,
+                        )
+            
+            # 按分数排序选择
+            all_figures.sort(key=lambda x: x["total_score"], reverse=True)
+            
+            # 延迟写盘：只编码保存得分最高的 k 个候选（原生候选未写盘时一并处理）
+            for figure in all_figures[:persist_top_k]:
+                if figure["path"] is None:
+                    self._persist_figure(doc[figure["page"] - 1], figure)
+            self._wait_for_writes()
+        self._timer = None
+        stats["peak_rss_mb"] = peak_rss_mb()
+        stats["timings"] = timer.as_dict()
         
         main_figure = all_figures[0]["path"] if all_figures else None
         secondary = all_figures[1]["path"] if len(all_figures) > 1 else None
@@ -254,13 +2399,14 @@ class DocLayoutExtractor:
         logger.success(f"共提取 {len(all_figures)} 个图片")
         if main_figure:
             best = all_figures[0]
-            logger.info(f"   主图: {main_figure.name} (p{best['page']}, {best['size'][0]}x{best['size'][1]}, score={best['total_score']:.1f})")
+            logger.info(f"   主图: {best['filename']} (p{best['page']}, {best['size'][0]}x{best['size'][1]}, score={best['total_score']:.1f})")
         
         return {
             "figures": all_figures,
             "main_figure": main_figure,
             "secondary_figure": secondary,
             "total_figures": len(all_figures),
+            "stats": stats,
         }
 
 
@@ -279,8 +2425,9 @@ def extract_figures_doclayout(pdf_path: str, output_dir: str = "output/figures")
             "total": int
         }
     """
-    extractor = DocLayoutExtractor(output_dir=output_dir)
-    result = extractor.extract_from_pdf(pdf_path)
+    # 引擎由进程级注册表共享，多次调用只加载一次模型；编码线程池随提取器关闭
+    with DocLayoutExtractor(output_dir=output_dir) as extractor:
+        result = extractor.extract_from_pdf(pdf_path)
     return {
         "main_figure": result["main_figure"],
         "all_figures": [f["path"] for f in result["figures"]],
@@ -288,24 +2435,308 @@ def extract_figures_doclayout(pdf_path: str, output_dir: str = "output/figures")
     }
 
 
-if __name__ == "__main__":
-    import sys
+# 批量提取时每个 worker 进程内复用的提取器（引擎由进程级注册表共享，只加载一次）
+_batch_extractor: Optional[DocLayoutExtractor] = None
+
+
+def _close_batch_extractor():
+    """关闭并丢弃本进程复用的批量提取器（在当前进程内顺序执行的批量任务结束时调用）"""
+    global _batch_extractor
+    if _batch_extractor is not None:
+        _batch_extractor.close()
+        _batch_extractor = None
+
+# 批量结果 JSONL 中每个候选保留的字段
+BATCH_FIGURE_FIELDS = ("path", "format", "page", "rect", "size", "total_score", "detection_score", "source", "caption")
+
+
+def _to_jsonable(value):
+    """json.dumps 的 default：Path 转字符串，numpy 标量 / 数组转 Python 原生类型"""
+    if isinstance(value, Path):
+        return str(value)
+    if isinstance(value, (np.generic, np.ndarray)):
+        return value.tolist()
+    raise TypeError(f"无法序列化: {type(value).__name__}")
+
+
+def _batch_output_name(pdf_path: str) -> str:
+    """批量提取的图片文件名前缀：PDF 文件名 + 完整路径的短哈希，不同目录下的同名 PDF 不会互相覆盖"""
+    digest = hashlib.sha256(str(pdf_path).encode("utf-8")).hexdigest()[:8]
+    return f"{Path(pdf_path).stem}_{digest}"
+
+
+def _batch_extract_worker(pdf_path: str, extractor_kwargs: Dict, extract_kwargs: Dict) -> Dict:
+    """
+    批量提取的单个任务：提取一个 PDF 并返回一条 JSONL 记录
+
+    单个 PDF 的异常记录为 status="error"，不影响池中其他任务
+    """
+    global _batch_extractor
+    if _batch_extractor is None:
+        _batch_extractor = DocLayoutExtractor(**extractor_kwargs)
+        if multiprocessing.parent_process() is not None:
+            # 进程池 worker 退出时关闭；在当前进程内执行时由 run_batch 收尾
+            multiprocessing.util.Finalize(None, _close_batch_extractor, exitpriority=10)
+    
+    record = {"pdf": pdf_path, "pid": os.getpid()}
+    start = time.perf_counter()
+    try:
+        result = _batch_extractor.extract_from_pdf(
+            pdf_path, output_name=_batch_output_name(pdf_path), **extract_kwargs
+        )
+    except Exception as e:
+        logger.warning(f"提取失败 {pdf_path}: {e}")
+        record.update(status="error", error=f"{type(e).__name__}: {e}")
+        record["timings"] = {"extract_s": round(time.perf_counter() - start, 3)}
+        return record
+    elapsed = time.perf_counter() - start
+    
+    stats = dict(result["stats"])
+    stats.pop("page_memory", None)
+    stages = stats.pop("timings", {})
+    pages = stats["pages_scanned"]
+    record.update(
+        status="ok",
+        main_figure=result["main_figure"],
+        total_figures=result["total_figures"],
+        figures=[{key: figure[key] for key in BATCH_FIGURE_FIELDS} for figure in result["figures"]],
+        timings={
+            "extract_s": round(elapsed, 3),
+            "ms_per_page": round(elapsed / pages * 1000, 1) if pages else None,
+            "stages": {stage: t["seconds"] for stage, t in stages.items()},
+        },
+        stats=stats,
+    )
+    return record
+
+
+def collect_pdf_paths(inputs: Iterable[str], list_file: Optional[str] = None) -> List[str]:
+    """
+    展开批量提取的输入为去重后的 PDF 绝对路径列表（保持输入顺序）
+
+    Args:
+        inputs: PDF 文件或目录（目录递归查找 *.pdf）
+        list_file: 每行一个 PDF 路径的清单文件（空行与 # 开头的行忽略）
+    """
+    items = list(inputs)
+    if list_file:
+        with open(list_file, "r", encoding="utf-8") as f:
+            items.extend(line.strip() for line in f if line.strip() and not line.startswith("#"))
+    
+    pdfs = []
+    for item in items:
+        path = Path(item)
+        if path.is_dir():
+            pdfs.extend(sorted(path.rglob("*.pdf")))
+        elif path.suffix.lower() == ".pdf":
+            pdfs.append(path)
+        else:
+            logger.warning(f"跳过非 PDF 输入: {item}")
+    return list(dict.fromkeys(str(p.resolve()) for p in pdfs))
+
+
+def load_batch_records(output_path: str) -> Dict[str, Dict]:
+    """
+    读取已有的批量结果 JSONL，返回 {PDF 路径: 最后一条记录}
+
+    崩溃时可能留下写了一半的末行，无法解析的行直接忽略
+    """
+    records = {}
+    path = Path(output_path)
+    if not path.exists():
+        return records
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if isinstance(record, dict) and "pdf" in record:
+                records[record["pdf"]] = record
+    return records
+
+
+def run_batch(
+    pdfs: List[str],
+    output_path: str,
+    workers: int = 1,
+    extractor_kwargs: Optional[Dict] = None,
+    extract_kwargs: Optional[Dict] = None,
+    start_method: str = "forkserver",
+    retry_errors: bool = False,
+    log_level: Optional[str] = None,
+) -> Dict:
+    """
+    批量提取多个 PDF，每完成一个追加一行 JSONL 记录
+
+    输出文件中已有记录的 PDF 会被跳过，崩溃或中断后重新运行同一命令即可续跑。
+
+    Args:
+        pdfs: PDF 路径列表（建议为 collect_pdf_paths 的结果，续跑时按路径字符串匹配）
+        output_path: JSONL 输出路径（追加写入）
+        workers: 进程数；1 时在当前进程内顺序执行，>1 时使用 create_worker_pool 的预热进程池
+        extractor_kwargs: DocLayoutExtractor 的构造参数
+        extract_kwargs: extract_from_pdf 的参数
+        start_method: 进程池启动方式，见 create_worker_pool
+        retry_errors: 重新处理输出中 status 为 error 的 PDF
+        log_level: worker 进程的 loguru 日志级别（通常与主进程一致）；为 None 时保留 loguru 默认配置
+
+    Returns:
+        {"total": int, "skipped": int, "ok": int, "error": int, "elapsed_s": float}
+    """
+    extractor_kwargs = dict(extractor_kwargs or {})
+    extract_kwargs = dict(extract_kwargs or {})
+    
+    done = load_batch_records(output_path)
+    todo = [
+        pdf for pdf in pdfs
+        if pdf not in done or (retry_errors and done[pdf].get("status") != "ok")
+    ]
+    summary = {"total": len(pdfs), "skipped": len(pdfs) - len(todo), "ok": 0, "error": 0}
+    logger.info(f"共 {len(pdfs)} 个 PDF，已完成 {summary['skipped']} 个，待处理 {len(todo)} 个")
+    
+    output = Path(output_path)
+    output.parent.mkdir(parents=True, exist_ok=True)
+    truncated = False
+    if output.exists() and output.stat().st_size:
+        with open(output, "rb") as f:
+            f.seek(-1, os.SEEK_END)
+            truncated = f.read(1) != b"\n"
+    
+    start = time.perf_counter()
+    with open(output, "a", encoding="utf-8") as out:
+        if truncated:
+            # 上次崩溃留下的半行单独成行，避免与新记录粘连
+            out.write("\n")
+        
+        def write(record: Dict):
+            # 每行写完立即刷盘，崩溃时最多丢失正在写的一行
+            out.write(json.dumps(record, ensure_ascii=False, default=_to_jsonable) + "\n")
+            out.flush()
+            summary[record["status"]] += 1
+            finished = summary["ok"] + summary["error"]
+            logger.info(
+                f"[{finished}/{len(todo)}] {record['status']:5s} {Path(record['pdf']).name} "
+                f"({record['timings']['extract_s']:.2f}s)"
+            )
+        
+        if workers <= 1:
+            try:
+                for pdf in todo:
+                    write(_batch_extract_worker(pdf, extractor_kwargs, extract_kwargs))
+            finally:
+                _close_batch_extractor()
+        elif todo:
+            backend = extractor_kwargs.get("backend") or os.getenv("DOC_LAYOUT_BACKEND", "paddle")
+            if backend == "paddle":
+                pool = create_worker_pool(
+                    workers,
+                    model_dir=extractor_kwargs.get("model_dir"),
+                    device=extractor_kwargs.get("device", "cpu"),
+                    start_method=start_method,
+                    log_level=log_level,
+                )
+            else:
+                # 其他后端不需要预加载 Paddle 引擎
+                pool = ProcessPoolExecutor(
+                    max_workers=workers, mp_context=multiprocessing.get_context(start_method),
+                    initializer=_configure_worker_logging, initargs=(log_level,),
+                )
+            try:
+                futures = {
+                    pool.submit(_batch_extract_worker, pdf, extractor_kwargs, extract_kwargs): pdf
+                    for pdf in todo
+                }
+                for future in as_completed(futures):
+                    try:
+                        record = future.result()
+                    except Exception as e:
+                        # worker 进程崩溃（如 MuPDF 段错误）时池不可再用，剩余任务同样在此记为失败
+                        record = {
+                            "pdf": futures[future], "status": "error",
+                            "error": f"{type(e).__name__}: {e}", "timings": {"extract_s": 0.0},
+                        }
+                    write(record)
+            finally:
+                pool.shutdown(wait=True, cancel_futures=True)
+    
+    summary["elapsed_s"] = round(time.perf_counter() - start, 2)
+    return summary
+
+
+def main():
+    """
+    批量提取命令行入口
+
+    用法（在仓库根目录执行）：
+        python -m scripts.doclayout_extractor test_paper/ --output figures.jsonl --workers 4
+        python -m scripts.doclayout_extractor --list pdfs.txt --output figures.jsonl --caption-first
+    """
+    parser = argparse.ArgumentParser(description="Batch figure extraction with PP-DocLayoutV2")
+    parser.add_argument("inputs", nargs="*", default=[], help="PDF files or directories (searched recursively)")
+    parser.add_argument("--list", default=None, help="Text file with one PDF path per line")
+    parser.add_argument("--output", default="output/figures.jsonl", help="JSONL results file (appended, used for resuming)")
+    parser.add_argument("--output-dir", default="output/figures", help="Directory for extracted images")
+    parser.add_argument("--workers", type=int, default=1, help="Worker processes, each with one warm engine")
+    parser.add_argument("--start-method", default="forkserver", choices=["forkserver", "fork", "spawn"],
+                        help="Worker pool start method")
+    parser.add_argument("--model-dir", default=None, help="PP-DocLayoutV2 model directory")
+    parser.add_argument("--device", default="cpu", help="Inference device")
+    parser.add_argument("--backend", default=None, choices=["paddle", "onnx", "onnx-int8", "opencv"],
+                        help="Detector backend (default DOC_LAYOUT_BACKEND or paddle; opencv needs no model)")
+    parser.add_argument("--cache-dir", default=None, help="Layout detection cache directory")
+    parser.add_argument("--max-pages", type=int, default=8, help="Pages per PDF")
+    parser.add_argument("--dpi", type=int, default=300, help="Output crop DPI")
+    parser.add_argument("--detect-dpi", type=int, default=None, help="Layout detection DPI")
+    parser.add_argument("--batch-size", type=int, default=1, help="Pages per inference batch")
+    parser.add_argument("--top-k", type=int, default=None, help="Only write the k best candidates per PDF")
+    parser.add_argument("--caption-first", action="store_true", help="Detect caption pages first")
+    parser.add_argument("--retry-errors", action="store_true", help="Re-run PDFs recorded with status=error")
+    parser.add_argument("--log-level", default="INFO", help="Log level")
+    args = parser.parse_args()
     
-    # 设置日志
     logger.remove()
-    logger.add(sys.stderr, level="DEBUG")
+    logger.add(sys.stderr, level=args.log_level)
     
-    # 测试
-    test_pdfs = list(Path("test_paper").glob("*.pdf"))
-    if not test_pdfs:
-        print("未找到测试 PDF，请将 PDF 放到 test_paper/ 目录")
+    pdfs = collect_pdf_paths(args.inputs or (["test_paper"] if not args.list else []), args.list)
+    if not pdfs:
+        print("未找到 PDF，请指定 PDF 文件 / 目录，或将 PDF 放到 test_paper/ 目录")
         sys.exit(1)
     
-    print(f"\n找到 {len(test_pdfs)} 个测试 PDF")
-    
-    for pdf in test_pdfs[:3]:
-        print(f"\n{'='*60}")
-        result = extract_figures_doclayout(str(pdf), output_dir="test_output")
-        print(f"PDF: {pdf.name}")
-        print(f"主图: {result['main_figure']}")
-        print(f"总数: {result['total']}")
+    summary = run_batch(
+        pdfs,
+        args.output,
+        workers=args.workers,
+        extractor_kwargs=dict(
+            output_dir=args.output_dir, model_dir=args.model_dir,
+            device=args.device, cache_dir=args.cache_dir, backend=args.backend,
+        ),
+        extract_kwargs=dict(
+            max_pages=args.max_pages, dpi=args.dpi, detect_dpi=args.detect_dpi,
+            batch_size=args.batch_size, persist_top_k=args.top_k,
+            caption_first=args.caption_first,
+        ),
+        start_method=args.start_method,
+        retry_errors=args.retry_errors,
+        log_level=args.log_level,
+    )
+    logger.success(
+        f"完成: 成功 {summary['ok']}，失败 {summary['error']}，跳过 {summary['skipped']}，"
+        f"耗时 {summary['elapsed_s']:.1f}s → {args.output}"
+    )
+    if summary["error"]:
+        sys.exit(1)
+
+
+if os.getenv(PRELOAD_ENV) == "1" and __name__ != "__main__":
+    # fork server 内预加载；清除标记，避免其派生进程再创建的子进程重复加载
+    os.environ.pop(PRELOAD_ENV, None)
+    _configure_worker_logging(os.environ.pop(LOG_LEVEL_ENV, None))
+    try:
+        preload_engine(device=os.getenv("DOC_LAYOUT_DEVICE", "cpu"))
+    except (FileNotFoundError, ImportError) as e:
+        logger.warning(f"fork server 预加载引擎失败: {e}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,250 @@
+"""
+Layout Daemon - 本机共享的 PP-DocLayoutV2 布局检测守护进程
+
+功能：
+- 独占加载一份 LayoutDetection 引擎，多个 storyteller 进程共用，避免每个进程各占一份模型内存
+- 通过 Unix domain socket 接收请求，页面像素走共享内存，socket 上只传元数据
+- 将一个时间窗口内来自不同客户端的请求合并成一个批次推理
+- 返回与 DocLayoutExtractor._detect_layout 相同结构的结果
+
+用法（在仓库根目录执行）：
+    python -m scripts.layout_daemon --socket /tmp/doclayout.sock
+    DOC_LAYOUT_DAEMON_SOCKET=/tmp/doclayout.sock python paper_storyteller_skill.py 2311.14405
+"""
+
+import argparse
+import os
+import queue
+import socket
+import socketserver
+import stat
+import sys
+import threading
+import time
+from multiprocessing import resource_tracker, shared_memory
+from typing import Dict, List, Optional
+
+import numpy as np
+from loguru import logger
+
+from .doclayout_extractor import (
+    _recv_message,
+    _send_message,
+    get_layout_engine,
+    parse_layout_result,
+)
+
+DEFAULT_SOCKET_PATH = "/tmp/doclayout.sock"
+
+
+def _attach_shared_memory(name: str) -> shared_memory.SharedMemory:
+    """
+    以只读方式附着客户端创建的共享内存
+
+    共享内存由客户端负责 unlink；附着方需取消 resource_tracker 登记，
+    否则守护进程退出时会误删 / 报告泄漏
+    """
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:  # Python < 3.13 不支持 track 参数
+        shm = shared_memory.SharedMemory(name=name)
+        resource_tracker.unregister(shm._name, "shared_memory")
+        return shm
+
+
+class _PendingRequest:
+    """一个客户端请求：待检测的页面与结果通知"""
+
+    def __init__(self, images: List[np.ndarray]):
+        self.images = images
+        self.layouts: Optional[List[Dict]] = None
+        self.error: Optional[str] = None
+        self.done = threading.Event()
+
+
+class LayoutDaemon:
+    """布局检测守护进程"""
+
+    def __init__(
+        self,
+        socket_path: str = DEFAULT_SOCKET_PATH,
+        model_dir: Optional[str] = None,
+        device: str = "cpu",
+        batch_window_ms: float = 10.0,
+        max_batch: int = 8,
+    ):
+        """
+        Args:
+            socket_path: Unix socket 路径
+            model_dir: 模型目录
+            device: 推理设备
+            batch_window_ms: 收到第一个请求后等待更多请求合批的时间窗口
+            max_batch: 单批最多页面数
+        """
+        self.socket_path = socket_path
+        self.model_dir = model_dir
+        self.device = device
+        self.batch_window = batch_window_ms / 1000
+        self.max_batch = max(1, max_batch)
+        self._queue: "queue.Queue[_PendingRequest]" = queue.Queue()
+        self._server: Optional[socketserver.ThreadingUnixStreamServer] = None
+
+    def _next_batch(self) -> List[_PendingRequest]:
+        """阻塞取到第一个请求，再在时间窗口内尽量凑满一个批次"""
+        batch = [self._queue.get()]
+        count = len(batch[0].images)
+        deadline = time.monotonic() + self.batch_window
+        while count < self.max_batch:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                request = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            batch.append(request)
+            count += len(request.images)
+        return batch
+
+    def _batch_loop(self, engine):
+        """推理线程：按批次执行检测并唤醒各请求的处理线程"""
+        while True:
+            batch = self._next_batch()
+            images = [image for request in batch for image in request.images]
+            results = None
+            try:
+                results = list(engine.predict(images, batch_size=len(images)))
+                layouts = [parse_layout_result(res) for res in results]
+                offset = 0
+                for request in batch:
+                    request.layouts = layouts[offset:offset + len(request.images)]
+                    offset += len(request.images)
+            except Exception as e:
+                logger.exception("批量推理失败")
+                for request in batch:
+                    request.error = str(e)
+            finally:
+                # 推理结果可能引用输入数组，释放后处理线程才能关闭共享内存
+                images = results = None
+                for request in batch:
+                    request.done.set()
+            logger.debug(f"完成一个批次: {len(batch)} 个请求")
+
+    def _make_handler(self):
+        daemon = self
+
+        class Handler(socketserver.BaseRequestHandler):
+            def handle(self):
+                segments = []
+                try:
+                    message = _recv_message(self.request)
+                    images = []
+                    for header in message["images"]:
+                        shm = _attach_shared_memory(header["shm"])
+                        segments.append(shm)
+                        # 直接在共享内存上构造数组，不复制像素
+                        images.append(np.ndarray(
+                            tuple(header["shape"]), dtype=np.dtype(header["dtype"]), buffer=shm.buf
+                        ))
+                    request = _PendingRequest(images)
+                    daemon._queue.put(request)
+                    request.done.wait()
+                    del images
+                    request.images = []
+                    if request.error is not None:
+                        _send_message(self.request, {"error": request.error})
+                    else:
+                        _send_message(self.request, {"layouts": request.layouts})
+                except Exception as e:
+                    logger.warning(f"处理请求失败: {e}")
+                    try:
+                        _send_message(self.request, {"error": str(e)})
+                    except OSError:
+                        pass
+                finally:
+                    for shm in segments:
+                        try:
+                            shm.close()
+                        except BufferError:
+                            logger.warning(f"共享内存仍被引用，延迟释放: {shm.name}")
+
+        return Handler
+
+    def _remove_stale_socket(self):
+        """
+        删除上次异常退出遗留的 socket 文件
+
+        先尝试连接：连接被拒绝说明无人监听，可以删除；有守护进程应答或路径不是 socket 时抛出 RuntimeError
+        """
+        try:
+            mode = os.stat(self.socket_path).st_mode
+        except FileNotFoundError:
+            return
+        if not stat.S_ISSOCK(mode):
+            raise RuntimeError(f"{self.socket_path} 已存在且不是 socket 文件")
+        
+        probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        probe.settimeout(1.0)
+        try:
+            probe.connect(self.socket_path)
+        except ConnectionRefusedError:
+            logger.info(f"删除遗留的 socket 文件: {self.socket_path}")
+            os.unlink(self.socket_path)
+            return
+        except FileNotFoundError:
+            return
+        finally:
+            probe.close()
+        raise RuntimeError(f"已有守护进程在 {self.socket_path} 上监听")
+
+    def serve_forever(self):
+        """加载引擎并开始服务（阻塞）；同一 socket 上已有守护进程时抛出 RuntimeError"""
+        # 先检查 socket，避免为注定启动失败的进程加载模型
+        self._remove_stale_socket()
+        engine = get_layout_engine(self.model_dir, self.device)
+
+        threading.Thread(target=self._batch_loop, args=(engine,), daemon=True).start()
+        self._server = socketserver.ThreadingUnixStreamServer(self.socket_path, self._make_handler())
+        self._server.daemon_threads = True
+        logger.success(f"布局检测守护进程已启动: {self.socket_path}")
+        try:
+            self._server.serve_forever()
+        finally:
+            self._server.server_close()
+            if os.path.exists(self.socket_path):
+                os.unlink(self.socket_path)
+
+    def shutdown(self):
+        """停止服务（可在其他线程调用）"""
+        if self._server is not None:
+            self._server.shutdown()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local PP-DocLayoutV2 layout detection daemon")
+    parser.add_argument("--socket", default=DEFAULT_SOCKET_PATH, help="Unix socket path")
+    parser.add_argument("--model-dir", default=None, help="PP-DocLayoutV2 model directory")
+    parser.add_argument("--device", default="cpu", help="Inference device")
+    parser.add_argument("--window-ms", type=float, default=10.0, help="Cross-client batching window")
+    parser.add_argument("--max-batch", type=int, default=8, help="Max pages per inference batch")
+    parser.add_argument("--log-level", default="INFO", help="Log level")
+    args = parser.parse_args()
+
+    logger.remove()
+    logger.add(sys.stderr, level=args.log_level)
+
+    try:
+        LayoutDaemon(
+            socket_path=args.socket,
+            model_dir=args.model_dir,
+            device=args.device,
+            batch_window_ms=args.window_ms,
+            max_batch=args.max_batch,
+        ).serve_forever()
+    except RuntimeError as e:
+        logger.error(str(e))
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
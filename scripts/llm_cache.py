@@ -0,0 +1,167 @@
+"""
+LLM Response Cache - 基于 SQLite 的 LLM 响应磁盘缓存
+
+功能：
+- 按 (模型名, 完整 prompt 文本, 附带图片的内容哈希) 缓存 generate_content 的文本结果
+- 总大小上限 + LRU 淘汰，条目超过 TTL 自动失效
+- SQLite WAL 模式，多线程 / 多进程并发读写安全
+"""
+
+import hashlib
+import sqlite3
+import time
+from contextlib import closing
+from pathlib import Path
+from typing import Any, Iterable, Optional
+
+from loguru import logger
+
+# 默认缓存位置与容量
+DEFAULT_CACHE_PATH = "cache/llm_responses.sqlite"
+DEFAULT_MAX_SIZE_MB = 200
+DEFAULT_TTL_DAYS = 30
+
+# 缓存模式
+CACHE_MODES = ("use", "refresh", "off")
+
+
+class LLMResponseCache:
+    """LLM 文本响应的持久化缓存"""
+
+    def __init__(
+        self,
+        cache_path: str = DEFAULT_CACHE_PATH,
+        max_size_mb: float = DEFAULT_MAX_SIZE_MB,
+        ttl_days: float = DEFAULT_TTL_DAYS,
+    ):
+        self.cache_path = Path(cache_path)
+        self.cache_path.parent.mkdir(parents=True, exist_ok=True)
+        self.max_size_bytes = int(max_size_mb * 1024 * 1024)
+        self.ttl_seconds = ttl_days * 86400
+        self._init_db()
+
+    def _connect(self) -> sqlite3.Connection:
+        """每次操作使用独立连接，线程与进程间互不共享句柄"""
+        conn = sqlite3.connect(str(self.cache_path), timeout=30, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def _init_db(self):
+        with closing(self._connect()) as conn:
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS responses (
+                    key TEXT PRIMARY KEY,
+                    model TEXT NOT NULL,
+                    response TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    created_at REAL NOT NULL,
+                    accessed_at REAL NOT NULL
+                )
+                """
+            )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_responses_accessed ON responses (accessed_at)"
+            )
+
+    @staticmethod
+    def make_key(model_name: str, contents: Any) -> str:
+        """
+        计算缓存键
+
+        Args:
+            model_name: 模型名称
+            contents: 传给 generate_content 的内容（字符串，或字符串 / PIL 图片 / bytes 的列表）
+
+        Returns:
+            SHA-256 十六进制字符串
+        """
+        h = hashlib.sha256()
+        h.update(model_name.encode("utf-8"))
+        parts = contents if isinstance(contents, (list, tuple)) else [contents]
+        for part in parts:
+            h.update(b"\x00")
+            if isinstance(part, str):
+                h.update(b"text:")
+                h.update(part.encode("utf-8"))
+            elif isinstance(part, (bytes, bytearray)):
+                h.update(b"bytes:")
+                h.update(hashlib.sha256(part).digest())
+            elif hasattr(part, "tobytes") and hasattr(part, "size") and hasattr(part, "mode"):
+                # PIL 图片：按像素内容哈希，与文件名 / 路径无关
+                h.update(f"image:{part.mode}:{part.size}:".encode("utf-8"))
+                h.update(hashlib.sha256(part.tobytes()).digest())
+            else:
+                h.update(f"repr:{part!r}".encode("utf-8"))
+        return h.hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        """读取缓存，过期或不存在返回 None"""
+        now = time.time()
+        try:
+            with closing(self._connect()) as conn:
+                row = conn.execute(
+                    "SELECT response, created_at FROM responses WHERE key = ?", (key,)
+                ).fetchone()
+                if row is None:
+                    return None
+                response, created_at = row
+                if now - created_at > self.ttl_seconds:
+                    conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                    return None
+                conn.execute(
+                    "UPDATE responses SET accessed_at = ? WHERE key = ?", (now, key)
+                )
+                return response
+        except sqlite3.Error as e:
+            logger.warning(f"读取 LLM 缓存失败: {e}")
+            return None
+
+    def put(self, key: str, model_name: str, response: str):
+        """写入缓存，并按 LRU 淘汰超出容量的条目"""
+        now = time.time()
+        size = len(response.encode("utf-8"))
+        try:
+            with closing(self._connect()) as conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO responses "
+                    "(key, model, response, size, created_at, accessed_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (key, model_name, response, size, now, now),
+                )
+                self._evict(conn, now)
+        except sqlite3.Error as e:
+            logger.warning(f"写入 LLM 缓存失败: {e}")
+
+    def _evict(self, conn: sqlite3.Connection, now: float):
+        """删除过期条目，再按最近访问时间淘汰直到总大小不超过上限"""
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute(
+                "DELETE FROM responses WHERE created_at < ?", (now - self.ttl_seconds,)
+            )
+            total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+            if total > self.max_size_bytes:
+                stale = []
+                for key, size in conn.execute(
+                    "SELECT key, size FROM responses ORDER BY accessed_at ASC"
+                ):
+                    if total <= self.max_size_bytes:
+                        break
+                    stale.append((key,))
+                    total -= size
+                conn.executemany("DELETE FROM responses WHERE key = ?", stale)
+                logger.debug(f"LLM 缓存淘汰 {len(stale)} 条")
+            conn.execute("COMMIT")
+        except sqlite3.Error:
+            conn.execute("ROLLBACK")
+            raise
+
+    def clear(self, keys: Optional[Iterable[str]] = None):
+        """清空缓存（或删除指定键）"""
+        with closing(self._connect()) as conn:
+            if keys is None:
+                conn.execute("DELETE FROM responses")
+            else:
+                conn.executemany("DELETE FROM responses WHERE key = ?", [(k,) for k in keys])
@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# 以仓库根目录为导入起点（与 python -m scripts.xxx 一致）
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
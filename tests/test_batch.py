@@ -0,0 +1,31 @@
+"""批量提取测试：合成 PDF + 假检测后端，不需要模型与 paddleocr"""
+
+import json
+from pathlib import Path
+
+from scripts import doclayout_extractor
+from scripts.benchmark_doclayout import FakeLayoutBackend, make_synthetic_pdf
+from scripts.doclayout_extractor import collect_pdf_paths, run_batch
+
+
+def test_same_stem_pdfs_in_different_directories_do_not_share_outputs(tmp_path, monkeypatch):
+    for seed, folder in enumerate(("a", "b")):
+        (tmp_path / folder).mkdir()
+        make_synthetic_pdf(tmp_path / folder / "p0.pdf", pages=4, seed=seed)
+    monkeypatch.setattr(doclayout_extractor, "_batch_extractor", None)
+
+    pdfs = collect_pdf_paths([str(tmp_path)])
+    output = tmp_path / "figures.jsonl"
+    summary = run_batch(
+        pdfs, str(output),
+        extractor_kwargs=dict(output_dir=str(tmp_path / "out"), backend=FakeLayoutBackend()),
+        extract_kwargs=dict(max_pages=4),
+    )
+    assert summary["ok"] == 2
+
+    records = [json.loads(line) for line in output.read_text(encoding="utf-8").splitlines()]
+    paths = [[figure["path"] for figure in record["figures"]] for record in records]
+    assert all(paths)
+    assert not set(paths[0]) & set(paths[1])
+    assert records[0]["main_figure"] != records[1]["main_figure"]
+    assert all(Path(path).exists() for record_paths in paths for path in record_paths)
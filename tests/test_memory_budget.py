@@ -0,0 +1,17 @@
+"""内存预算模式回归测试：合成大页面 PDF + 假检测后端，不需要模型与 paddleocr"""
+
+import pytest
+
+from scripts.benchmark_doclayout import check_memory_budget
+from scripts.doclayout_extractor import reset_peak_rss
+
+BUDGET_MB = 256
+
+
+@pytest.mark.skipif(not reset_peak_rss(), reason="当前平台无法重置 VmHWM")
+def test_memory_budget_bounds_peak_rss_and_keeps_main_figure(tmp_path):
+    results, failures = check_memory_budget(tmp_path, BUDGET_MB)
+    assert not failures, failures
+    unbounded, bounded = results.values()
+    assert max(bounded["dpis"]) <= 300 and min(bounded["dpis"]) < 300
+    assert bounded["largest_page_bytes"] < unbounded["largest_page_bytes"]